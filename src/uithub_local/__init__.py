@@ -1,13 +1,35 @@
 """Local Uithub package."""
 
-from .api import dump_repo
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .api import dump_repo, dump_repos
+
+
+def __getattr__(name: str) -> Any:
+    # imported on first use so ``import uithub_local`` stays cheap
+    if name in ("dump_repo", "dump_repos"):
+        from . import api
+
+        return getattr(api, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
+    "cache",
     "cli",
+    "ignore",
     "loader",
+    "matcher",
     "renderer",
     "tokenizer",
     "walker",
+    "watch",
     "downloader",
+    "gitindex",
+    "output",
     "dump_repo",
+    "dump_repos",
 ]
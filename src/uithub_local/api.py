@@ -3,11 +3,16 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any, Dict, Iterable
 
-from .downloader import download_repo
-from .renderer import render
-from .walker import DEFAULT_MAX_SIZE, collect_files
+from .cache import open_cache
+from .renderer import PIPELINE_DEPTH, render
+from .tokenizer import ENCODING_NAME
+from .utils import imap_ordered
+from .walker import DEFAULT_MAX_SIZE, iter_archive, iter_files
+
+if TYPE_CHECKING:
+    from .cache import ArchiveCache, ScanCache
 
 
 def dump_repo(
@@ -21,42 +26,155 @@ def dump_repo(
 
     Args:
         path_or_url: Local directory or remote repository URL.
-        fmt: Output format ("text", "json" or "html").
+        fmt: Output format ("text", "json", "jsonl", "html" or "html-lazy").
         encoding: Suggested encoding if the caller writes the dump to disk. The
             value is not used by ``dump_repo`` itself.
         **cli_kwargs: Extra options matching the CLI such as ``include``,
-            ``exclude``, ``max_size``, ``max_tokens``, ``binary_strict`` and
-            ``private_token``.
+            ``exclude``, ``max_size``, ``max_tokens``, ``partial``, ``tokenizer``,
+            ``encoding_model``, ``binary_strict``, ``gitignore``, ``jobs``,
+            ``tracked_only``, ``indent``, ``cache`` and ``private_token``.
+            For remote URLs ``cache`` keeps the downloaded archive and
+            revalidates it on the next call; ``indent=None`` writes compact
+            JSON.
 
     Returns:
         The rendered dump.
     """
+    path = Path(path_or_url)
+    if path.exists():
+        scan_cache = open_cache() if cli_kwargs.get("cache", True) else None
+        try:
+            return _dump_local(path, fmt=fmt, scan_cache=scan_cache, **cli_kwargs)
+        finally:
+            if scan_cache is not None:
+                scan_cache.close()
+
+    from .cache import open_archive_cache
 
+    archives = open_archive_cache() if cli_kwargs.get("cache", True) else None
+    return _dump_remote(str(path_or_url), fmt=fmt, archives=archives, **cli_kwargs)
+
+
+def _dump_local(
+    path: Path, *, fmt: str, scan_cache: ScanCache | None, **cli_kwargs: Any
+) -> str:
     include = cli_kwargs.get("include", ["*"])
     exclude = cli_kwargs.get("exclude", [])
     max_size = cli_kwargs.get("max_size", DEFAULT_MAX_SIZE)
     max_tokens = cli_kwargs.get("max_tokens")
+    partial = cli_kwargs.get("partial", False)
+    tokenizer = cli_kwargs.get("tokenizer", "exact")
+    encoding_model = cli_kwargs.get("encoding_model", ENCODING_NAME)
     binary_strict = cli_kwargs.get("binary_strict", True)
-    private_token = cli_kwargs.get("private_token")
+    gitignore = cli_kwargs.get("gitignore", True)
+    jobs = cli_kwargs.get("jobs", 1)
+    tracked_only = cli_kwargs.get("tracked_only", False)
+    indent = cli_kwargs.get("indent", 2)
 
-    path = Path(path_or_url)
-    if path.exists():
-        files = collect_files(
-            path,
-            include,
-            exclude,
-            max_size=max_size,
-            binary_strict=binary_strict,
+    files = iter_files(
+        path,
+        include,
+        exclude,
+        max_size=max_size,
+        binary_strict=binary_strict,
+        gitignore=gitignore,
+        jobs=jobs,
+        tracked_only=tracked_only,
+        load=True,
+        cache=scan_cache,
+    )
+    return render(
+        files,
+        path,
+        max_tokens=max_tokens,
+        partial=partial,
+        fmt=fmt,
+        indent=indent,
+        cache=scan_cache,
+        prefetch=PIPELINE_DEPTH,
+        jobs=jobs,
+        tokenizer=tokenizer,
+        encoding_model=encoding_model,
+    )
+
+
+def dump_repos(
+    paths_or_urls: Iterable[str | Path],
+    *,
+    fmt: str = "text",
+    encoding: str = "utf-8",
+    concurrency: int = 4,
+    **cli_kwargs: Any,
+) -> Dict[str, str]:
+    """Return dumps of several repositories, keyed by path or URL.
+
+    Takes the same options as :func:`dump_repo`. Up to *concurrency*
+    repositories are downloaded and rendered at once, so downloads overlap
+    with the processing of repositories that already arrived. Remote
+    archives are fetched over one pooled ``requests`` session and share the
+    archive cache; local directories share one scan cache. The result keeps
+    the order of *paths_or_urls*.
+    """
+    from .cache import open_archive_cache
+    from .downloader import pooled_session  # requests is only needed here
+
+    targets = [str(item) for item in paths_or_urls]
+    use_cache = cli_kwargs.get("cache", True)
+    archives = open_archive_cache() if use_cache else None
+    local = any(Path(target).exists() for target in targets)
+    scan_cache = open_cache() if use_cache and local else None
+    workers = max(1, min(concurrency, len(targets)))
+
+    try:
+        with pooled_session(workers) as session:
+
+            def _dump(target: str) -> str:
+                if Path(target).exists():
+                    return _dump_local(
+                        Path(target), fmt=fmt, scan_cache=scan_cache, **cli_kwargs
+                    )
+                return _dump_remote(
+                    target, fmt=fmt, archives=archives, session=session, **cli_kwargs
+                )
+
+            dumps = list(imap_ordered(_dump, targets, workers))
+    finally:
+        if scan_cache is not None:
+            scan_cache.close()
+    return dict(zip(targets, dumps))
+
+
+def _dump_remote(
+    url: str,
+    *,
+    fmt: str,
+    archives: ArchiveCache | None,
+    session: Any = None,
+    **cli_kwargs: Any,
+) -> str:
+    from .downloader import archive_root, open_archive  # requests is only needed here
+
+    with open_archive(
+        url, cli_kwargs.get("private_token"), cache=archives, session=session
+    ) as archive:
+        files = iter_archive(
+            archive,
+            cli_kwargs.get("include", ["*"]),
+            cli_kwargs.get("exclude", []),
+            max_size=cli_kwargs.get("max_size", DEFAULT_MAX_SIZE),
+            binary_strict=cli_kwargs.get("binary_strict", True),
+            gitignore=cli_kwargs.get("gitignore", True),
+            jobs=cli_kwargs.get("jobs", 1),
         )
-        return render(files, path, max_tokens=max_tokens, fmt=fmt)
-
-    url = str(path_or_url)
-    with download_repo(url, private_token) as tmp:
-        files = collect_files(
-            tmp,
-            include,
-            exclude,
-            max_size=max_size,
-            binary_strict=binary_strict,
+        return render(
+            files,
+            archive_root(archive, url),
+            max_tokens=cli_kwargs.get("max_tokens"),
+            partial=cli_kwargs.get("partial", False),
+            fmt=fmt,
+            indent=cli_kwargs.get("indent", 2),
+            prefetch=PIPELINE_DEPTH,
+            jobs=cli_kwargs.get("jobs", 1),
+            tokenizer=cli_kwargs.get("tokenizer", "exact"),
+            encoding_model=cli_kwargs.get("encoding_model", ENCODING_NAME),
         )
-        return render(files, tmp, max_tokens=max_tokens, fmt=fmt)
@@ -0,0 +1,398 @@
+"""Persistent caches: per-file scan results in SQLite and remote archives."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import IO, Iterable, NamedTuple, Set, Tuple
+
+DEFAULT_MAX_BYTES = 64 * 1_048_576
+# rows written before they are committed, keeping write locks short
+COMMIT_EVERY = 256
+# seconds a write waits for another run's lock before the cache stops writing
+BUSY_TIMEOUT = 2.0
+DEFAULT_ARCHIVE_BYTES = 512 * 1_048_576
+
+# bumped when the files table changes; older tables are dropped and rebuilt
+SCHEMA_VERSION = 1
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    root TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    level INTEGER NOT NULL,
+    sha TEXT,
+    used REAL NOT NULL,
+    PRIMARY KEY (root, path)
+);
+CREATE TABLE IF NOT EXISTS tokens (
+    sha TEXT NOT NULL,
+    model TEXT NOT NULL,
+    tokens INTEGER NOT NULL,
+    used REAL NOT NULL,
+    PRIMARY KEY (sha, model)
+);
+"""
+
+
+def default_cache_dir() -> Path:
+    """Return the user cache directory for uithub-local.
+
+    ``UITHUB_CACHE_DIR`` overrides the location; otherwise
+    ``$XDG_CACHE_HOME/uithub-local`` (``~/.cache/uithub-local``) is used.
+    """
+    override = os.environ.get("UITHUB_CACHE_DIR")
+    if override:
+        return Path(override).expanduser()
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join("~", ".cache")
+    return Path(base, "uithub-local").expanduser()
+
+
+class ScanRecord(NamedTuple):
+    """Cached facts about one file version.
+
+    ``level`` is the :func:`~uithub_local.utils.binary_level` sniffed from
+    the file, so one record serves both strict and lenient binary detection.
+    """
+
+    level: int
+    sha: str | None
+
+
+class ScanCache:
+    """Cache of binary level, content hash and token counts.
+
+    File rows are keyed by ``(root, path)`` and only valid while ``size`` and
+    ``mtime`` still match. Token counts are keyed by content hash and
+    tokenizer, so renamed or touched-but-unchanged files reuse their counts.
+    The database runs in WAL mode so concurrent runs can read while one
+    writes. Writes are committed every ``COMMIT_EVERY`` rows and on
+    :meth:`flush`; cache hits only refresh ``used`` when writes are
+    committed. Any SQLite error counts as a cache miss, and once a write
+    cannot get the lock within *timeout* seconds the cache stops writing for
+    the rest of the run. :meth:`close` evicts least recently used rows once
+    the database exceeds ``max_bytes``. The cache is safe to share between
+    threads.
+    """
+
+    def __init__(
+        self,
+        path: Path | None = None,
+        *,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        timeout: float = BUSY_TIMEOUT,
+    ) -> None:
+        self.path = path or default_cache_dir() / "scan.sqlite3"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._now = time.time()
+        self._pending = 0
+        self._writable = True
+        # rows read since the last commit, whose ``used`` is refreshed then
+        self._used_files: Set[Tuple[str, str]] = set()
+        self._used_tokens: Set[Tuple[str, str]] = set()
+        self._db = sqlite3.connect(self.path, timeout=timeout, check_same_thread=False)
+        try:
+            self._db.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.Error:
+            pass  # e.g. another connection is mid-write; keep the current mode
+        (version,) = self._db.execute("PRAGMA user_version").fetchone()
+        if version != SCHEMA_VERSION:
+            self._db.executescript(
+                "DROP TABLE IF EXISTS files;"
+                f"{_SCHEMA}PRAGMA user_version={SCHEMA_VERSION};"
+            )
+        else:
+            self._db.executescript(_SCHEMA)
+
+    def __enter__(self) -> "ScanCache":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def lookup(
+        self, root: str, path: str, size: int, mtime: float
+    ) -> ScanRecord | None:
+        with self._lock:
+            try:
+                row = self._db.execute(
+                    "SELECT size, mtime, level, sha FROM files"
+                    " WHERE root=? AND path=?",
+                    (root, path),
+                ).fetchone()
+            except sqlite3.Error:
+                return None
+            if row is None or row[0] != size or row[1] != mtime:
+                return None
+            self._used_files.add((root, path))
+        return ScanRecord(int(row[2]), row[3])
+
+    def store(
+        self,
+        root: str,
+        path: str,
+        size: int,
+        mtime: float,
+        *,
+        level: int,
+        sha: str | None = None,
+    ) -> None:
+        with self._lock:
+            self._write(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (root, path, size, mtime, level, sha, self._now),
+            )
+
+    def tokens(self, sha: str, model: str) -> int | None:
+        with self._lock:
+            try:
+                row = self._db.execute(
+                    "SELECT tokens FROM tokens WHERE sha=? AND model=?", (sha, model)
+                ).fetchone()
+            except sqlite3.Error:
+                return None
+            if row is None:
+                return None
+            self._used_tokens.add((sha, model))
+        return int(row[0])
+
+    def store_tokens(self, sha: str, model: str, tokens: int) -> None:
+        with self._lock:
+            self._write(
+                "INSERT OR REPLACE INTO tokens VALUES (?, ?, ?, ?)",
+                (sha, model, tokens, self._now),
+            )
+
+    def _write(self, sql: str, params: Tuple[object, ...]) -> None:
+        # caller holds self._lock
+        if not self._writable:
+            return
+        try:
+            self._db.execute(sql, params)
+        except sqlite3.Error:
+            self._give_up()
+            return
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY:
+            self._commit()
+
+    def _commit(self) -> None:
+        # caller holds self._lock
+        if self._writable and (self._used_files or self._used_tokens):
+            try:
+                self._db.executemany(
+                    "UPDATE files SET used=? WHERE root=? AND path=?",
+                    [(self._now, root, path) for root, path in self._used_files],
+                )
+                self._db.executemany(
+                    "UPDATE tokens SET used=? WHERE sha=? AND model=?",
+                    [(self._now, sha, model) for sha, model in self._used_tokens],
+                )
+            except sqlite3.Error:
+                self._give_up()
+        self._used_files.clear()
+        self._used_tokens.clear()
+        self._pending = 0
+        try:
+            self._db.commit()
+        except sqlite3.Error:
+            self._give_up()
+
+    def _give_up(self) -> None:
+        # another run holds the write lock: keep reading, stop writing
+        self._writable = False
+        self._pending = 0
+        try:
+            self._db.rollback()
+        except sqlite3.Error:
+            pass
+
+    def _size(self) -> int:
+        (pages,) = self._db.execute("PRAGMA page_count").fetchone()
+        (page_size,) = self._db.execute("PRAGMA page_size").fetchone()
+        return int(pages) * int(page_size)
+
+    def evict(self) -> None:
+        """Drop the least recently used half of the rows while over budget."""
+        with self._lock:
+            if not self._writable:
+                return
+            try:
+                self._evict()
+            except sqlite3.Error:
+                self._give_up()
+
+    def _evict(self) -> None:
+        while self._size() > self.max_bytes:
+            removed = 0
+            for table in ("files", "tokens"):
+                (count,) = self._db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+                removed += self._db.execute(
+                    f"DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM"
+                    f" {table} ORDER BY used LIMIT ?)",
+                    ((count + 1) // 2,),
+                ).rowcount
+            self._db.commit()
+            if not removed:
+                break
+            self._db.execute("VACUUM")
+
+    def flush(self) -> None:
+        """Commit pending writes without closing the cache."""
+        with self._lock:
+            self._commit()
+
+    def close(self) -> None:
+        self.flush()
+        self.evict()
+        self._db.close()
+
+
+def open_cache(path: Path | None = None) -> ScanCache | None:
+    """Return a :class:`ScanCache` or None if the cache cannot be opened."""
+    try:
+        return ScanCache(path)
+    except (OSError, sqlite3.Error):
+        return None
+
+
+class CachedArchive(NamedTuple):
+    """A cached archive and the validators the server sent with it."""
+
+    path: Path
+    etag: str | None
+    last_modified: str | None
+
+
+class ArchiveCache:
+    """Downloaded repository archives keyed by archive URL.
+
+    Each entry is a ``.zip`` next to a ``.json`` file holding the ``ETag`` and
+    ``Last-Modified`` headers it was served with, so it can be revalidated
+    with a conditional request. An archive's mtime records when it was last
+    used; :meth:`evict` drops the least recently used archives once together
+    they exceed ``max_bytes``. Entries are replaced atomically, so several
+    processes can share the directory.
+    """
+
+    def __init__(
+        self, directory: Path | None = None, *, max_bytes: int = DEFAULT_ARCHIVE_BYTES
+    ) -> None:
+        self.directory = directory or default_cache_dir() / "archives"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+    def _paths(self, url: str) -> Tuple[Path, Path]:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.directory / f"{key}.zip", self.directory / f"{key}.json"
+
+    def lookup(self, url: str) -> CachedArchive | None:
+        archive, meta = self._paths(url)
+        try:
+            validators = json.loads(meta.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if validators.get("url") != url or not archive.is_file():
+            return None
+        return CachedArchive(
+            archive, validators.get("etag"), validators.get("last_modified")
+        )
+
+    def touch(self, entry: CachedArchive) -> None:
+        """Mark *entry* as just used."""
+        try:
+            os.utime(entry.path)
+        except OSError:
+            pass
+
+    def scratch(self) -> IO[bytes]:
+        """Return a new temporary file in the cache directory for :meth:`adopt`."""
+        return tempfile.NamedTemporaryFile(
+            dir=self.directory, suffix=".part", delete=False
+        )
+
+    def adopt(
+        self,
+        url: str,
+        path: Path,
+        *,
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ) -> Path:
+        """Move the downloaded archive at *path* into place for *url*."""
+        archive, meta = self._paths(url)
+        validators = {"url": url, "etag": etag, "last_modified": last_modified}
+        os.replace(path, archive)
+        _replace(meta, [json.dumps(validators).encode("utf-8")])
+        self.evict(keep=archive)
+        return archive
+
+    def store(
+        self,
+        url: str,
+        chunks: Iterable[bytes],
+        *,
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ) -> Path:
+        """Write the archive in *chunks* for *url* and return its path."""
+        with self.scratch() as fh:
+            try:
+                for chunk in chunks:
+                    fh.write(chunk)
+            except BaseException:
+                os.unlink(fh.name)
+                raise
+        return self.adopt(url, Path(fh.name), etag=etag, last_modified=last_modified)
+
+    def evict(self, keep: Path | None = None) -> None:
+        """Drop least recently used archives, never *keep*, while over budget."""
+        entries = []
+        for path in self.directory.glob("*.zip"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            for stale in (path, path.with_suffix(".json")):
+                try:
+                    stale.unlink()
+                except OSError:
+                    pass
+            total -= size
+
+
+def _replace(path: Path, chunks: Iterable[bytes]) -> None:
+    # write next to *path* and rename, so readers never see a partial file
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            for chunk in chunks:
+                fh.write(chunk)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def open_archive_cache(directory: Path | None = None) -> ArchiveCache | None:
+    """Return an :class:`ArchiveCache` or None if it cannot be created."""
+    try:
+        return ArchiveCache(directory)
+    except OSError:
+        return None
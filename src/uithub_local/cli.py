@@ -2,14 +2,68 @@
 
 from __future__ import annotations
 
+import functools
+import os
+import warnings
 from pathlib import Path
-from typing import List, cast
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    TextIO,
+    Tuple,
+    TypeVar,
+    cast,
+)
 
 import click
 
-from .renderer import render
-from .walker import DEFAULT_MAX_SIZE, collect_files
-from .downloader import download_repo
+from .output import COMPRESSIONS, infer_compression, open_output
+from .renderer import PIPELINE_DEPTH, render_shards, render_to
+from .tokenizer import (
+    ENCODING_NAME,
+    ENCODINGS,
+    FALLBACK_MODEL,
+    TOKENIZERS,
+    EncodingUnavailable,
+)
+from .utils import imap_ordered
+from .walker import DEFAULT_MAX_SIZE, FileInfo, iter_archive, iter_files
+
+if TYPE_CHECKING:
+    from .cache import ScanCache
+
+# Heavier modules (requests via .downloader, sqlite3 via .cache, .watch) are
+# imported inside the code paths that use them to keep startup fast.
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+def _report_fallback(func: F) -> F:
+    """Report a tiktoken fallback in one line instead of a Python warning."""
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        with warnings.catch_warnings():
+            show = warnings.showwarning
+
+            def _show(message: Any, category: Any, *rest: Any, **kw: Any) -> None:
+                if isinstance(message, EncodingUnavailable):
+                    click.echo(
+                        f"Warning: tiktoken encoding {message.encoding!r} could "
+                        f"not be loaded; estimating tokens as {FALLBACK_MODEL}",
+                        err=True,
+                    )
+                else:
+                    show(message, category, *rest, **kw)
+
+            warnings.showwarning = _show
+            return func(*args, **kwargs)
+
+    return cast(F, wrapper)
 
 
 @click.command(context_settings={"help_option_names": ["-h", "--help"]})
@@ -18,7 +72,23 @@ from .downloader import download_repo
     required=False,
     type=click.Path(exists=True, file_okay=False, path_type=Path),
 )
-@click.option("--remote-url", help="Git repo URL to download")
+@click.option(
+    "--remote-url",
+    multiple=True,
+    help="Git repo URL to download; repeat to dump several repos",
+)
+@click.option(
+    "--url-list",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="File with one repo URL per line ('#' starts a comment)",
+)
+@click.option(
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=4,
+    show_default=True,
+    help="Remote repos downloaded and dumped at once",
+)
 @click.option("--private-token", envvar="GITHUB_TOKEN", help="Token for private repos")
 @click.option(
     "--include",
@@ -41,75 +111,439 @@ from .downloader import download_repo
     show_default=f"{DEFAULT_MAX_SIZE} bytes",
     help="Skip files larger than this many bytes",
 )
-@click.option("--max-tokens", type=int, help="Hard cap; truncate largest files first")
+@click.option("--max-tokens", type=int, help="Hard cap; drop the largest files first")
+@click.option(
+    "--shard-tokens",
+    type=click.IntRange(min=1),
+    help="Split the dump into --outfile shards of at most this many tokens",
+)
+@click.option(
+    "--partial",
+    is_flag=True,
+    help="With --max-tokens, fill the remaining budget with the start of a file",
+)
 @click.option(
     "--format",
     "fmt",
-    type=click.Choice(["text", "json", "html"]),
+    type=click.Choice(["text", "json", "jsonl", "html", "html-lazy"]),
     default="text",
+    help=(
+        "'jsonl' writes one record per file followed by a summary record; "
+        "'html-lazy' compresses file bodies and decodes them when opened"
+    ),
+)
+@click.option("--compact", is_flag=True, help="Write JSON without indentation")
+@click.option(
+    "--tokenizer",
+    type=click.Choice(TOKENIZERS),
+    default="exact",
+    show_default=True,
+    help="'fast' estimates tokens from file size; exact counts near --max-tokens",
+)
+@click.option(
+    "--encoding-model",
+    type=click.Choice(ENCODINGS),
+    default=ENCODING_NAME,
+    show_default=True,
+    help="tiktoken encoding used to count tokens",
 )
 @click.option(
     "--binary-strict/--no-binary-strict",
     default=True,
     help="Use strict binary detection",
 )
+@click.option(
+    "--gitignore/--no-gitignore",
+    default=True,
+    help="Honour .gitignore, .git/info/exclude and global git excludes",
+)
+@click.option(
+    "--tracked-only",
+    is_flag=True,
+    help="Only dump files tracked in the git index",
+)
+@click.option(
+    "--jobs",
+    type=int,
+    default=1,
+    show_default=True,
+    help="Worker threads for scanning files (0 = one per CPU)",
+)
+@click.option(
+    "--cache/--no-cache",
+    default=True,
+    help="Reuse scan results, token counts and remote archives from previous runs",
+)
 @click.option("--stdout/--no-stdout", default=True, help="Print dump to STDOUT")
-@click.option("--outfile", type=click.Path(path_type=Path), help="Write dump to file")
+@click.option(
+    "--outfile",
+    type=click.Path(path_type=Path),
+    help="Write dump to file; '{n}' is replaced by the shard number",
+)
+@click.option(
+    "--compress",
+    type=click.Choice(COMPRESSIONS + ("none",)),
+    help="Compress --outfile [default: from its suffix, e.g. .gz, .xz, .zst]",
+)
 @click.option(
     "--encoding",
     default="utf-8",
     show_default=True,
     help="Encoding for --outfile",
 )
+@click.option(
+    "--watch",
+    is_flag=True,
+    help="Keep --outfile up to date as files change (local PATH only)",
+)
+@click.option(
+    "--interval",
+    type=float,
+    default=1.0,
+    show_default=True,
+    help="Seconds between change polls in --watch mode",
+)
 @click.version_option()
+@_report_fallback
 def main(
     path: Path | None,
-    remote_url: str | None,
+    remote_url: Tuple[str, ...],
+    url_list: Path | None,
+    concurrency: int,
     private_token: str | None,
     include: List[str],
     exclude: List[str],
     max_size: int,
     max_tokens: int | None,
+    shard_tokens: int | None,
+    partial: bool,
     fmt: str,
+    compact: bool,
+    tokenizer: str,
+    encoding_model: str,
     binary_strict: bool,
+    gitignore: bool,
+    tracked_only: bool,
+    jobs: int,
+    cache: bool,
     stdout: bool,
     outfile: Path | None,
+    compress: str | None,
     encoding: str,
+    watch: bool,
+    interval: float,
 ) -> None:
     """Flatten a repository into one text dump."""
-    if remote_url and path:
+    urls = _remote_urls(remote_url, url_list)
+    if urls and path:
         raise click.UsageError("--remote-url cannot be used with PATH")
-    if not remote_url and not path:
+    if not urls and not path:
         raise click.UsageError("PATH or --remote-url required")
+    batch = len(urls) > 1
+    if batch and (outfile is None or "{repo}" not in str(outfile)):
+        raise click.UsageError("Several repos require an --outfile containing {repo}")
+    targets = _repo_outfiles(urls, outfile)
+    indent = None if compact else 2
+    compression = _compression(outfile, compress)
+    if shard_tokens is not None:
+        if watch or outfile is None or "{n}" not in str(outfile):
+            raise click.UsageError(
+                "--shard-tokens requires an --outfile containing {n} "
+                "and cannot be used with --watch"
+            )
+    if watch:
+        if urls or outfile is None:
+            raise click.UsageError("--watch requires PATH and --outfile")
+        _watch(
+            cast(Path, path),
+            outfile,
+            include,
+            exclude,
+            max_size=max_size,
+            binary_strict=binary_strict,
+            gitignore=gitignore,
+            tracked_only=tracked_only,
+            jobs=jobs,
+            max_tokens=max_tokens,
+            partial=partial,
+            fmt=fmt,
+            indent=indent,
+            tokenizer=tokenizer,
+            encoding_model=encoding_model,
+            encoding=encoding,
+            compression=compression,
+            cache=cache,
+            interval=interval,
+        )
+        return
+
+    options: Dict[str, Any] = {
+        "max_tokens": max_tokens,
+        "partial": partial,
+        "fmt": fmt,
+        "indent": indent,
+        "prefetch": PIPELINE_DEPTH,
+        "jobs": jobs,
+        "tokenizer": tokenizer,
+        "encoding_model": encoding_model,
+    }
+
+    def _emit(
+        files: Iterable[FileInfo],
+        root: Path,
+        target: Path | None,
+        scan_cache: Any = None,
+    ) -> None:
+        if shard_tokens is None:
+            # jsonl already ends each record with a newline
+            output = _Output(
+                target,
+                encoding,
+                stdout and not batch,
+                compression=compression,
+                newline=fmt != "jsonl",
+            )
+            try:
+                render_to(output, files, root, cache=scan_cache, **options)
+            except BaseException:
+                output.close(failed=True)
+                raise
+            output.close()
+            return
+        written = render_shards(
+            files,
+            root,
+            cast(Path, target),
+            shard_tokens,
+            cache=scan_cache,
+            encoding=encoding,
+            compression=compression,
+            **options,
+        )
+        for shard in written:
+            click.echo(f"Wrote {shard}", err=True)
 
     try:
-        if remote_url:
-            with download_repo(remote_url, private_token) as tmp:
-                files = collect_files(
-                    tmp,
+        if urls:
+            _dump_remote(
+                targets,
+                _emit,
+                private_token=private_token,
+                include=include,
+                exclude=exclude,
+                max_size=max_size,
+                binary_strict=binary_strict,
+                gitignore=gitignore,
+                jobs=jobs,
+                cache=cache,
+                concurrency=concurrency,
+                report=batch and shard_tokens is None,
+            )
+        else:
+            scan_cache = _open_cache() if cache else None
+            try:
+                files = iter_files(
+                    cast(Path, path),
                     include,
                     exclude,
                     max_size=max_size,
                     binary_strict=binary_strict,
+                    gitignore=gitignore,
+                    jobs=jobs,
+                    tracked_only=tracked_only,
+                    load=True,
+                    cache=scan_cache,
                 )
-                output = render(files, tmp, max_tokens=max_tokens, fmt=fmt)
-        else:
-            files = collect_files(
-                cast(Path, path),
-                include,
-                exclude,
-                max_size=max_size,
-                binary_strict=binary_strict,
-            )
-            output = render(files, cast(Path, path), max_tokens=max_tokens, fmt=fmt)
+                _emit(files, cast(Path, path), outfile, scan_cache)
+            finally:
+                if scan_cache is not None:
+                    scan_cache.close()
     except Exception as exc:  # pragma: no cover - fatal CLI errors
         click.echo(str(exc), err=True)
         raise SystemExit(1)
 
-    if outfile:
-        outfile.write_text(output, encoding=encoding, errors="replace")
-    if stdout:
-        click.echo(output)
+
+def _remote_urls(remote_url: Iterable[str], url_list: Path | None) -> List[str]:
+    urls = list(remote_url)
+    if url_list is not None:
+        for line in url_list.read_text(encoding="utf-8").splitlines():
+            line = line.split("#", 1)[0].strip()
+            if line:
+                urls.append(line)
+    return list(dict.fromkeys(urls))  # drop duplicates, keep order
+
+
+def _repo_outfiles(urls: List[str], outfile: Path | None) -> Dict[str, Path | None]:
+    # "{repo}" in the outfile becomes each repo's slug
+    if not urls:
+        return {}
+    from .downloader import repo_slug
+
+    targets: Dict[str, Path | None] = {}
+    for url in urls:
+        target = None
+        if outfile is not None:
+            target = Path(str(outfile).replace("{repo}", repo_slug(url)))
+            if target in targets.values():
+                raise click.UsageError(f"Several URLs write to {target}")
+        targets[url] = target
+    return targets
+
+
+def _dump_remote(
+    targets: Dict[str, Path | None],
+    emit: Callable[[Iterable[FileInfo], Path, Path | None], None],
+    *,
+    private_token: str | None,
+    include: List[str],
+    exclude: List[str],
+    max_size: int,
+    binary_strict: bool,
+    gitignore: bool,
+    jobs: int,
+    cache: bool,
+    concurrency: int,
+    report: bool,
+) -> None:
+    """Dump each URL in *targets* to its outfile, up to *concurrency* at once.
+
+    Downloads share one pooled session and the archive cache, and overlap
+    with rendering the repos that already arrived. With several repos a
+    failure is reported and the others are still written; the run then exits
+    with status 1.
+    """
+    from .cache import open_archive_cache
+    from .downloader import archive_root, open_archive, pooled_session
+
+    urls = list(targets)
+
+    archives = open_archive_cache() if cache else None
+    workers = min(concurrency, len(urls))
+
+    with pooled_session(workers) as session:
+
+        def _dump(url: str) -> str | None:
+            try:
+                with open_archive(
+                    url, private_token, cache=archives, session=session
+                ) as archive:
+                    files = iter_archive(
+                        archive,
+                        include,
+                        exclude,
+                        max_size=max_size,
+                        binary_strict=binary_strict,
+                        gitignore=gitignore,
+                        jobs=jobs,
+                    )
+                    emit(files, archive_root(archive, url), targets[url])
+            except Exception as exc:
+                if len(urls) == 1:
+                    raise
+                return f"{url}: {exc}"
+            return None
+
+        failures = 0
+        for url, error in zip(urls, imap_ordered(_dump, urls, workers)):
+            if error is not None:
+                failures += 1
+                click.echo(error, err=True)
+            elif report:
+                click.echo(f"Wrote {targets[url]}", err=True)
+    if failures:
+        raise SystemExit(1)
+
+
+class _Output:
+    """Write dump chunks to ``--outfile`` and/or STDOUT as they are rendered.
+
+    The dump goes to a temporary file next to ``outfile``, which replaces
+    it atomically once the run succeeds, so a failed run leaves an existing
+    file untouched.
+    """
+
+    def __init__(
+        self,
+        outfile: Path | None,
+        encoding: str,
+        stdout: bool,
+        *,
+        compression: str | None,
+        newline: bool,
+    ) -> None:
+        self.outfile = outfile
+        self.encoding = encoding
+        self.stdout = stdout
+        self.compression = compression
+        self.newline = newline
+        self._file: TextIO | None = None
+        self._tmp: Path | None = None
+        self._written = False
+
+    def write(self, text: str) -> int:
+        if self.outfile is not None and self._file is None:
+            self._tmp = self.outfile.with_name(f".{self.outfile.name}.tmp")
+            self._file = open_output(self._tmp, self.encoding, self.compression)
+        if self._file is not None:
+            self._file.write(text)
+        if self.stdout:
+            click.echo(text, nl=False)
+        self._written = True
+        return len(text)
+
+    def close(self, *, failed: bool = False) -> None:
+        """Move the finished outfile into place, or discard it if *failed*."""
+        if self._file is not None and self._tmp is not None:
+            self._file.close()
+            if failed:
+                self._tmp.unlink(missing_ok=True)
+            else:
+                os.replace(self._tmp, cast(Path, self.outfile))
+        if self.stdout and self._written and self.newline:
+            click.echo()  # trailing newline, as when echoing the whole dump
+
+
+def _compression(outfile: Path | None, compress: str | None) -> str | None:
+    if outfile is None:
+        if compress not in (None, "none"):
+            raise click.UsageError("--compress requires --outfile")
+        return None
+    if compress is None:
+        return infer_compression(outfile)
+    return None if compress == "none" else compress
+
+
+def _watch(
+    path: Path,
+    outfile: Path,
+    include: List[str],
+    exclude: List[str],
+    *,
+    cache: bool,
+    interval: float,
+    **options: Any,
+) -> None:
+    from .watch import Watcher
+
+    scan_cache = _open_cache() if cache else None
+    try:
+        watcher = Watcher(path, outfile, include, exclude, cache=scan_cache, **options)
+        click.echo(f"Watching {path}, writing {outfile} (Ctrl+C to stop)", err=True)
+        watcher.run(
+            interval,
+            on_update=lambda n: click.echo(f"Updated {outfile}: {n} file(s)", err=True),
+        )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if scan_cache is not None:
+            scan_cache.close()
+
+
+def _open_cache() -> ScanCache | None:
+    from .cache import open_cache
+
+    return open_cache()
 
 
 if __name__ == "__main__":  # pragma: no cover
@@ -2,60 +2,319 @@
 
 from __future__ import annotations
 
-import io
+import os
 import time
 import urllib.parse
 import requests  # type: ignore
 import zipfile
 from contextlib import contextmanager
 from pathlib import Path
-from tempfile import TemporaryDirectory
-from typing import Iterator
+from tempfile import SpooledTemporaryFile, TemporaryDirectory
+from typing import IO, TYPE_CHECKING, Dict, Iterator, Tuple, cast
+
+from .walker import archive_prefix
+
+if TYPE_CHECKING:
+    from .cache import ArchiveCache
+
+# archives up to this size stay in memory; larger ones spill to a temp file
+SPOOL_THRESHOLD = 16 * 1024 * 1024
+# bytes read from the network at once; a dropped connection loses at most one
+CHUNK_SIZE = 64 * 1024
+# tries per request, and per stretch of a download that makes no progress
+ATTEMPTS = 5
+# seconds before the first retry, doubled for each further one
+BACKOFF = 1.0
+# seconds to wait for a connection or for the next chunk
+TIMEOUT = 30
 
 
 @contextmanager
-def download_repo(url: str, token: str | None = None) -> Iterator[Path]:
-    """Yield a temporary directory with the extracted repo from ``url``."""
+def download_repo(
+    url: str, token: str | None = None, *, spool_threshold: int = SPOOL_THRESHOLD
+) -> Iterator[Path]:
+    """Yield a temporary directory with the extracted repo from ``url``.
+
+    See :func:`open_archive` for how the archive is downloaded.
+    """
+    tmp = TemporaryDirectory()
+    try:
+        with open_archive(url, token, spool_threshold=spool_threshold) as zf:
+            zf.extractall(tmp.name)
+        root_entries = list(Path(tmp.name).iterdir())
+        single = len(root_entries) == 1 and root_entries[0].is_dir()
+        root = root_entries[0] if single else Path(tmp.name)
+        yield root
+    finally:
+        tmp.cleanup()
+
+
+@contextmanager
+def open_archive(
+    url: str,
+    token: str | None = None,
+    *,
+    spool_threshold: int = SPOOL_THRESHOLD,
+    cache: ArchiveCache | None = None,
+    session: requests.Session | None = None,
+) -> Iterator[zipfile.ZipFile]:
+    """Download the repo archive for ``url`` and yield it as an open zip file.
+
+    The archive is streamed in ``CHUNK_SIZE`` chunks into a spooled temporary
+    file that moves to disk once it exceeds *spool_threshold* bytes, so
+    memory use does not grow with the archive size. Nothing is extracted;
+    members can be read directly, e.g. with
+    :func:`~uithub_local.walker.iter_archive`.
+
+    With a *cache*, a previously downloaded archive is revalidated with
+    ``If-None-Match`` / ``If-Modified-Since``; on ``304 Not Modified`` the
+    cached copy is used without downloading anything. Archives served with an
+    ``ETag`` or ``Last-Modified`` header are stored in the cache.
+    Requests go through *session* when given, e.g. a :func:`pooled_session`
+    shared between threads so connections are reused.
+
+    Connection errors, timeouts and 5xx responses are retried with
+    exponential backoff, and an interrupted download resumes from the bytes
+    already received (see :func:`_receive`). The archive's length and zip
+    structure are checked before it is yielded or cached.
+    """
     archive_url = _archive_url(url)
-    headers = {}
+    # byte ranges and Content-Length must refer to the archive itself
+    headers = {"Accept-Encoding": "identity"}
     if token:
         if "github.com" in archive_url:
             headers["Authorization"] = f"token {token}"
         else:
             headers["Authorization"] = f"Bearer {token}"
+    cached = cache.lookup(archive_url) if cache is not None else None
+    if cached is not None and not zipfile.is_zipfile(cached.path):
+        cached = None  # damaged entry: download it again
+    if cached is not None:
+        if cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
 
-    response = None
-    backoff = 1.0
-    for attempt in range(3):
-        response = requests.get(archive_url, headers=headers, timeout=30)
-        if response.status_code < 500:
-            break
-        if attempt < 2:
-            time.sleep(backoff)
-            backoff *= 2
-    assert response is not None
-    if response.status_code >= 400:
+    response = _request(archive_url, headers, session)
+    if response.status_code == 304 and cache is not None and cached is not None:
+        response.close()
+        cache.touch(cached)
+        archive: IO[bytes] = open(cached.path, "rb")
+    elif response.status_code >= 400:
+        response.close()
         raise RuntimeError(
             f"Failed to download {archive_url} (HTTP {response.status_code})"
         )
-    data = response.content
+    else:
+        headers.pop("If-None-Match", None)
+        headers.pop("If-Modified-Since", None)
+        # only archives that can be revalidated are worth caching
+        revalidatable = (
+            "ETag" in response.headers or "Last-Modified" in response.headers
+        )
+        store = cache if revalidatable else None
+        if store is not None:
+            archive = store.scratch()
+        else:
+            archive = cast(IO[bytes], SpooledTemporaryFile(max_size=spool_threshold))
+        try:
+            etag, last_modified = _receive(
+                archive_url, headers, session, response, archive
+            )
+        except BaseException:
+            archive.close()
+            if store is not None:
+                os.unlink(archive.name)
+            raise
+        if store is not None:
+            archive.close()
+            path = store.adopt(
+                archive_url,
+                Path(archive.name),
+                etag=etag,
+                last_modified=last_modified,
+            )
+            archive = open(path, "rb")
 
-    tmp = TemporaryDirectory()
+    with archive, zipfile.ZipFile(archive) as zf:
+        yield zf
+
+
+def pooled_session(connections: int) -> requests.Session:
+    """Return a session keeping up to *connections* connections per host.
+
+    Sharing one session between download threads reuses TCP connections,
+    TLS sessions and DNS lookups across archives.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=connections, pool_maxsize=connections
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _request(
+    archive_url: str, headers: Dict[str, str], session: requests.Session | None
+) -> requests.Response:
+    # retry connection errors, timeouts and server errors with backoff
+    get = session.get if session is not None else requests.get
+    backoff = BACKOFF
+    for attempt in range(1, ATTEMPTS + 1):
+        try:
+            response = get(archive_url, headers=headers, timeout=TIMEOUT, stream=True)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == ATTEMPTS:
+                raise
+        else:
+            if response.status_code < 500 or attempt == ATTEMPTS:
+                return response
+            response.close()
+        time.sleep(backoff)
+        backoff *= 2
+    raise AssertionError("unreachable")
+
+
+def _receive(
+    archive_url: str,
+    headers: Dict[str, str],
+    session: requests.Session | None,
+    response: requests.Response,
+    sink: IO[bytes],
+) -> Tuple[str | None, str | None]:
+    """Write the body of *response* to *sink* and validate the archive.
+
+    When the connection drops or stalls, the download resumes with a
+    ``Range`` request for the missing bytes, guarded by ``If-Range`` so a
+    changed archive is fetched from the start instead of being spliced. A
+    server that ignores the range sends the whole archive again. Returns the
+    ``ETag`` and ``Last-Modified`` of the archive that was received.
+    """
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    total = _content_length(response)
+    failures = 0
+    while True:
+        offset = sink.tell()
+        try:
+            with response:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    sink.write(chunk)
+            if total is None or sink.tell() >= total:
+                break
+            error: Exception = requests.ConnectionError("connection closed early")
+        except (
+            requests.ConnectionError,
+            requests.Timeout,
+            requests.exceptions.ChunkedEncodingError,
+        ) as exc:
+            error = exc
+        # attempts are counted from the last failure that made no progress
+        failures = 1 if sink.tell() > offset else failures + 1
+        if failures >= ATTEMPTS:
+            raise RuntimeError(f"Failed to download {archive_url}: {error}")
+        time.sleep(BACKOFF * 2 ** (failures - 1))
+
+        resume = dict(headers)
+        # a weak ETag cannot guard a range; fall back to Last-Modified
+        strong = etag if etag and not etag.startswith("W/") else None
+        validator = strong or last_modified
+        if validator and sink.tell():
+            resume["Range"] = f"bytes={sink.tell()}-"
+            resume["If-Range"] = validator
+        else:
+            sink.seek(0)
+            sink.truncate()
+        response = _request(archive_url, resume, session)
+        if response.status_code == 206:
+            start, total = _content_range(response)
+            if start != sink.tell():
+                response.close()
+                raise RuntimeError(f"Unexpected range from {archive_url}")
+        elif response.status_code == 200:
+            sink.seek(0)
+            sink.truncate()
+            total = _content_length(response)
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+        else:
+            response.close()
+            raise RuntimeError(
+                f"Failed to download {archive_url} (HTTP {response.status_code})"
+            )
+    _validate(archive_url, sink, total)
+    return etag, last_modified
+
+
+def _validate(archive_url: str, archive: IO[bytes], total: int | None) -> None:
+    size = archive.seek(0, os.SEEK_END)
+    if total is not None and size != total:
+        raise RuntimeError(
+            f"Incomplete download of {archive_url} ({size} of {total} bytes)"
+        )
+    archive.seek(0)
+    if not zipfile.is_zipfile(archive):
+        raise RuntimeError(f"Downloaded {archive_url} is not a valid zip archive")
+    archive.seek(0)
+
+
+def _content_length(response: requests.Response) -> int | None:
     try:
-        with zipfile.ZipFile(io.BytesIO(data)) as zf:
-            zf.extractall(tmp.name)
-        root_entries = list(Path(tmp.name).iterdir())
-        single = len(root_entries) == 1 and root_entries[0].is_dir()
-        root = root_entries[0] if single else Path(tmp.name)
-        yield root
-    finally:
-        tmp.cleanup()
+        return int(response.headers["Content-Length"])
+    except (KeyError, ValueError):
+        return None
+
+
+def _content_range(response: requests.Response) -> Tuple[int, int | None]:
+    # "bytes 100-199/200" -> (100, 200); an unknown total is "*"
+    value = response.headers.get("Content-Range", "")
+    try:
+        span, _, length = value.split(" ", 1)[1].partition("/")
+        start = int(span.split("-", 1)[0])
+    except (IndexError, ValueError):
+        return -1, None
+    return start, int(length) if length.isdigit() else None
+
+
+def archive_root(archive: zipfile.ZipFile, url: str) -> Path:
+    """Return the root to render members of *archive* from ``url`` under.
+
+    The path does not exist; it only names the repo in the dump, after the
+    archive's top-level directory or, failing that, the URL.
+    """
+    prefix = archive_prefix(archive).rstrip("/")
+    return Path(prefix or Path(urllib.parse.urlparse(url).path).stem or "repo")
+
+
+def repo_slug(url: str) -> str:
+    """Return a file-name friendly name for the repo at ``url``.
+
+    ``https://github.com/owner/repo`` becomes ``owner-repo``; direct ``.zip``
+    URLs are named after the file.
+    """
+    if url.endswith(".zip"):
+        return Path(urllib.parse.urlparse(url).path).stem or "repo"
+    _, slug = _host_and_slug(url)
+    return slug.replace("/", "-")
 
 
 def _archive_url(url: str) -> str:
     if url.endswith(".zip"):
         return url
 
+    host, slug = _host_and_slug(url)
+    if host.endswith("github.com"):
+        return f"https://api.github.com/repos/{slug}/zipball"
+    if host.endswith("gitlab.com"):
+        repo = slug.split("/")[-1]
+        return f"https://gitlab.com/{slug}/-/archive/master/{repo}-master.zip"
+    if host.endswith("bitbucket.org"):
+        return f"https://bitbucket.org/{slug}/get/master.zip"
+    raise ValueError("Unsupported host")
+
+
+def _host_and_slug(url: str) -> Tuple[str, str]:
     parsed = urllib.parse.urlparse(url)
     host = parsed.hostname
     path = parsed.path
@@ -71,13 +330,4 @@ def _archive_url(url: str) -> str:
 
     if path.endswith(".git"):
         path = path[:-4]
-    slug = path.strip("/")
-
-    if host.endswith("github.com"):
-        return f"https://api.github.com/repos/{slug}/zipball"
-    if host.endswith("gitlab.com"):
-        repo = slug.split("/")[-1]
-        return f"https://gitlab.com/{slug}/-/archive/master/{repo}-master.zip"
-    if host.endswith("bitbucket.org"):
-        return f"https://bitbucket.org/{slug}/get/master.zip"
-    raise ValueError("Unsupported host")
+    return host, path.strip("/")
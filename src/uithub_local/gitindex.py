@@ -0,0 +1,143 @@
+"""Read tracked file entries from a git index (``.git/index``)."""
+
+from __future__ import annotations
+
+import struct
+from pathlib import Path
+from typing import List, NamedTuple
+
+_HEADER = struct.Struct(">4sLL")
+# ctime s/ns, mtime s/ns, dev, ino, mode, uid, gid, size
+_STAT = struct.Struct(">LLLLLLLLLL")
+_MODE_TYPE = 0o170000
+_MODE_REGULAR = 0o100000
+_FLAG_EXTENDED = 0x4000
+_FLAG_STAGE = 0x3000
+_EXT_SKIP_WORKTREE = 0x4000
+
+
+class IndexEntry(NamedTuple):
+    """A regular file recorded in the git index.
+
+    ``size`` and ``mtime_ns`` are the file's stat data when it was staged; a
+    file whose current stat still matches holds the blob ``sha``.
+    """
+
+    path: str
+    size: int
+    mtime_ns: int
+    sha: bytes
+
+
+def git_dir(root: Path) -> Path | None:
+    """Return the git directory of the work tree at *root*, if any."""
+    dot_git = root / ".git"
+    if dot_git.is_dir():
+        return dot_git
+    try:
+        text = dot_git.read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+    if text.startswith("gitdir:"):
+        target = Path(text[len("gitdir:") :].strip())
+        return target if target.is_absolute() else root / target
+    return None
+
+
+def _hash_size(gitdir: Path) -> int:
+    try:
+        config = (gitdir / "config").read_text(encoding="utf-8", errors="replace")
+    except OSError:
+        return 20
+    lowered = config.replace(" ", "").lower()
+    return 32 if "objectformat=sha256" in lowered else 20
+
+
+def _varint(data: bytes, pos: int) -> tuple[int, int]:
+    byte = data[pos]
+    pos += 1
+    value = byte & 0x7F
+    while byte & 0x80:
+        byte = data[pos]
+        pos += 1
+        value = ((value + 1) << 7) | (byte & 0x7F)
+    return value, pos
+
+
+def parse_index(data: bytes, hash_size: int = 20) -> List[IndexEntry]:
+    """Parse the bytes of a version 2, 3 or 4 git index.
+
+    Only stage-0 regular files that are present in the work tree are
+    returned. Raises ``ValueError`` for data that is not a git index.
+    """
+    try:
+        signature, version, count = _HEADER.unpack_from(data, 0)
+    except struct.error as exc:
+        raise ValueError("truncated git index") from exc
+    if signature != b"DIRC" or version not in (2, 3, 4):
+        raise ValueError("unsupported git index")
+
+    entries: List[IndexEntry] = []
+    pos = _HEADER.size
+    previous = b""
+    try:
+        for _ in range(count):
+            start = pos
+            fields = _STAT.unpack_from(data, pos)
+            pos += _STAT.size
+            sha = data[pos : pos + hash_size]
+            pos += hash_size
+            (flags,) = struct.unpack_from(">H", data, pos)
+            pos += 2
+            extended = 0
+            if version >= 3 and flags & _FLAG_EXTENDED:
+                (extended,) = struct.unpack_from(">H", data, pos)
+                pos += 2
+            if version == 4:
+                strip, pos = _varint(data, pos)
+                end = data.index(b"\0", pos)
+                name = previous[: len(previous) - strip] + data[pos:end]
+                pos = end + 1
+            else:
+                end = data.index(b"\0", pos)
+                name = data[pos:end]
+                # entries are NUL padded to a multiple of eight bytes
+                pos = start + ((end - start + 8) & ~7)
+            previous = name
+            mode, size = fields[6], fields[9]
+            if (
+                flags & _FLAG_STAGE
+                or extended & _EXT_SKIP_WORKTREE
+                or mode & _MODE_TYPE != _MODE_REGULAR
+            ):
+                continue
+            entries.append(
+                IndexEntry(
+                    path=name.decode("utf-8", errors="surrogateescape"),
+                    size=size,
+                    mtime_ns=fields[2] * 1_000_000_000 + fields[3],
+                    sha=sha,
+                )
+            )
+    except (struct.error, IndexError, ValueError) as exc:
+        raise ValueError("truncated git index") from exc
+    return entries
+
+
+def read_index(root: Path) -> List[IndexEntry] | None:
+    """Return tracked entries for the work tree at *root* or None if unreadable.
+
+    Like git, entries modified no earlier than the index was written are
+    "racily clean": their stat data cannot prove the contents unchanged, so
+    their ``sha`` is cleared to ``b""``.
+    """
+    gitdir = git_dir(root)
+    if gitdir is None:
+        return None
+    index = gitdir / "index"
+    try:
+        written = index.stat().st_mtime_ns
+        entries = parse_index(index.read_bytes(), _hash_size(gitdir))
+    except (OSError, ValueError):
+        return None
+    return [e if e.mtime_ns < written else e._replace(sha=b"") for e in entries]
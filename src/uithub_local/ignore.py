@@ -0,0 +1,207 @@
+"""Gitignore rule parsing and per-directory ignore index."""
+
+from __future__ import annotations
+
+import os
+import re
+from pathlib import Path
+from typing import Iterable, List, NamedTuple, Pattern, Tuple
+
+from .gitindex import git_dir
+
+
+def _translate(pattern: str) -> str:
+    """Translate a gitignore glob (without anchoring) to a regex body."""
+    out: List[str] = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith("**/", i) and (i == 0 or pattern[i - 1] == "/"):
+            out.append("(?:.*/)?")
+            i += 3
+        elif (
+            pattern.startswith("**", i)
+            and i + 2 == n
+            and (i == 0 or pattern[i - 1] == "/")
+        ):
+            out.append(".*")
+            i += 2
+        elif c == "*":
+            out.append("[^/]*")
+            i += 1
+        elif c == "?":
+            out.append("[^/]")
+            i += 1
+        elif c == "[":
+            j = i + 1
+            if j < n and pattern[j] in "!^":
+                j += 1
+            if j < n and pattern[j] == "]":
+                j += 1
+            while j < n and pattern[j] != "]":
+                j += 1
+            if j >= n:
+                out.append(re.escape(c))
+                i += 1
+                continue
+            body = pattern[i + 1 : j]
+            if body[:1] in ("!", "^"):
+                body = "^" + body[1:]
+            out.append("[" + body.replace("\\", "\\\\") + "]")
+            i = j + 1
+        elif c == "\\" and i + 1 < n:
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return "".join(out)
+
+
+class IgnoreRule(NamedTuple):
+    """A single parsed gitignore line."""
+
+    regex: str
+    negate: bool
+    dir_only: bool
+
+
+def parse_rule(line: str) -> IgnoreRule | None:
+    """Return the rule for one gitignore *line* or None for blanks/comments."""
+    line = line.rstrip("\n\r")
+    if not line or line.startswith("#"):
+        return None
+    # trailing spaces are ignored unless escaped
+    while line.endswith(" ") and not line.endswith("\\ "):
+        line = line[:-1]
+    if not line:
+        return None
+    negate = line.startswith("!")
+    if negate or line.startswith("\\!") or line.startswith("\\#"):
+        line = line[1:]
+    dir_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+    anchored = "/" in line
+    line = line.lstrip("/")
+    body = _translate(line)
+    if not anchored:
+        body = "(?:.*/)?" + body
+    return IgnoreRule(body, negate, dir_only)
+
+
+class _Level(NamedTuple):
+    base: str
+    files: Pattern[str] | None
+    file_negates: Tuple[bool, ...]
+    dirs: Pattern[str] | None
+    dir_negates: Tuple[bool, ...]
+
+
+def _compile(rules: List[IgnoreRule]) -> Tuple[Pattern[str] | None, Tuple[bool, ...]]:
+    # Later rules win, so alternatives are ordered last-first and the index of
+    # the matching group identifies the deciding rule in a single match.
+    ordered = list(reversed(rules))
+    if not ordered:
+        return None, ()
+    regex = re.compile("|".join(f"({r.regex})\\Z" for r in ordered), re.S)
+    return regex, (False,) + tuple(r.negate for r in ordered)
+
+
+def _level(base: str, lines: Iterable[str]) -> _Level | None:
+    rules = [r for r in map(parse_rule, lines) if r is not None]
+    if not rules:
+        return None
+    files, file_negates = _compile([r for r in rules if not r.dir_only])
+    dirs, dir_negates = _compile(rules)
+    return _Level(base, files, file_negates, dirs, dir_negates)
+
+
+class IgnoreIndex:
+    """Stack of compiled gitignore levels, shallowest first.
+
+    Each level holds the rules of one ignore file compiled into a single
+    regex, so deciding a path costs at most one match per enclosing
+    ``.gitignore``. Indexes are immutable; ``child`` returns a new index that
+    shares the parent's levels.
+    """
+
+    def __init__(self, levels: Tuple[_Level, ...] = ()) -> None:
+        self._levels = levels
+
+    def child(self, base: str, lines: Iterable[str]) -> "IgnoreIndex":
+        """Return an index extended with rules from a file in ``base``."""
+        level = _level(base, lines)
+        if level is None:
+            return self
+        return IgnoreIndex(self._levels + (level,))
+
+    def child_from_file(self, base: str, path: Path) -> "IgnoreIndex":
+        try:
+            text = path.read_text(encoding="utf-8", errors="replace")
+        except OSError:
+            return self
+        return self.child(base, text.splitlines())
+
+    def ignored(self, rel_path: str, is_dir: bool = False) -> bool:
+        """Return True if *rel_path* (relative to the walk root) is ignored."""
+        for level in reversed(self._levels):
+            if not rel_path.startswith(level.base):
+                continue
+            sub = rel_path[len(level.base) :]
+            regex, negates = (
+                (level.dirs, level.dir_negates)
+                if is_dir
+                else (level.files, level.file_negates)
+            )
+            if regex is None:
+                continue
+            match = regex.match(sub)
+            if match is not None:
+                return not negates[match.lastindex or 0]
+        return False
+
+
+def _global_excludes_file() -> Path:
+    xdg = os.environ.get("XDG_CONFIG_HOME") or os.path.join("~", ".config")
+    configs = [Path(xdg, "git", "config"), Path("~", ".gitconfig")]
+    for config in configs:
+        try:
+            text = config.expanduser().read_text(encoding="utf-8", errors="replace")
+        except OSError:
+            continue
+        section = ""
+        for raw in text.splitlines():
+            line = raw.strip()
+            if line.startswith("["):
+                section = line.strip("[]").strip().lower()
+            elif section == "core" and "=" in line:
+                key, value = (s.strip() for s in line.split("=", 1))
+                if key.lower() == "excludesfile" and value:
+                    return Path(value.strip('"')).expanduser()
+    return Path(xdg, "git", "ignore").expanduser()
+
+
+def root_index(root: Path) -> IgnoreIndex | None:
+    """Return the ignore index for *root* before any ``.gitignore`` is read.
+
+    Returns None when *root* is not inside a git work tree, where git itself
+    ignores ``.gitignore`` files. At the top of a work tree the index holds
+    the global excludes file and ``.git/info/exclude``, which rank below
+    every ``.gitignore``.
+    """
+    if not in_work_tree(root):
+        return None
+    index = IgnoreIndex()
+    gitdir = git_dir(root)
+    if gitdir is not None:
+        index = index.child_from_file("", _global_excludes_file())
+        index = index.child_from_file("", gitdir / "info" / "exclude")
+    return index
+
+
+def in_work_tree(path: Path) -> bool:
+    """Return True if *path* or one of its parents has a ``.git`` entry."""
+    path = path.resolve()
+    return any((parent / ".git").exists() for parent in (path, *path.parents))
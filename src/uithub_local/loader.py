@@ -2,13 +2,75 @@
 
 from __future__ import annotations
 
+import mmap
+import os
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Iterator, Tuple, Union
 
+from .utils import SNIFF_SIZE, binary_level, is_binary_bytes, is_binary_level
 
-def load_text(path: Path) -> str:
-    """Return text of *path* with UTF-8 fallback."""
+MMAP_THRESHOLD = 256 * 1024
+
+Buffer = Union[bytes, mmap.mmap]
+
+
+def decode_text(data: Buffer) -> str:
+    """Return *data* decoded as UTF-8, replacing invalid sequences.
 
+    ``\r\n`` and ``\r`` become ``\n``, as with universal newlines in
+    :meth:`Path.read_text`.
+    """
     try:
-        return path.read_text(encoding="utf-8")
+        text = str(data, "utf-8")
     except UnicodeDecodeError:
-        return path.read_text(encoding="utf-8", errors="replace")
+        text = str(data, "utf-8", "replace")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+def ingest(path: Path | str, *, strict: bool = True) -> str | None:
+    """Read *path* once and return its text, or ``None`` if it looks binary.
+
+    The same buffer is sniffed with :func:`~uithub_local.utils.is_binary_bytes`
+    and decoded, so each file is opened and read a single time.
+    """
+    return ingest_level(path, strict=strict)[1]
+
+
+def ingest_level(path: Path | str, *, strict: bool = True) -> Tuple[int, str | None]:
+    """Like :func:`ingest`, but also return the file's binary level.
+
+    The level lets callers record what was measured rather than the verdict
+    for one value of *strict*.
+    """
+    with _read(path) as data:
+        level = binary_level(data[:SNIFF_SIZE])
+        if is_binary_level(level, strict=strict):
+            return level, None
+        return level, decode_text(data)
+
+
+def sniff_text(data: Buffer, *, strict: bool = True) -> str | None:
+    """Return *data* decoded as text, or ``None`` if it looks binary."""
+    if is_binary_bytes(data[:SNIFF_SIZE], strict=strict):
+        return None
+    return decode_text(data)
+
+
+def load_text(path: Path) -> str:
+    """Return text of *path* with UTF-8 fallback."""
+    with _read(path) as data:
+        return decode_text(data)
+
+
+@contextmanager
+def _read(path: Path | str) -> Iterator[Buffer]:
+    # files of at least MMAP_THRESHOLD bytes are mapped rather than copied
+    with open(path, "rb", buffering=0) as fh:
+        if os.fstat(fh.fileno()).st_size < MMAP_THRESHOLD:
+            yield fh.read()
+            return
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
@@ -0,0 +1,69 @@
+"""Compiled include/exclude glob matching."""
+
+from __future__ import annotations
+
+import fnmatch
+import os
+import re
+from typing import Iterable, List, Pattern
+
+_WILDCARDS = re.compile(r"[*?\[]")
+# fnmatch.fnmatch normalises case on case-insensitive platforms; mirror that.
+_FOLD_CASE = os.path.normcase("A") == "a"
+
+
+def _fold(value: str) -> str:
+    return value.lower() if _FOLD_CASE else value
+
+
+def _compile(patterns: Iterable[str]) -> Pattern[str] | None:
+    parts = [fnmatch.translate(_fold(p)) for p in patterns]
+    if not parts:
+        return None
+    return re.compile("|".join(parts))
+
+
+class PathMatcher:
+    """Match relative POSIX paths against include and exclude globs.
+
+    All patterns are compiled once into a single regular expression per side,
+    so a lookup costs one regex match instead of one ``fnmatch`` call per
+    pattern. Semantics are those of ``fnmatch.fnmatch``: ``*`` and ``**`` both
+    match across ``/``.
+    """
+
+    def __init__(self, include: Iterable[str], exclude: Iterable[str]) -> None:
+        self.include: List[str] = list(include)
+        self.exclude: List[str] = list(exclude)
+        self._include = _compile(self.include)
+        self._exclude = _compile(self.exclude)
+        # "dir/**" excludes everything below any directory matching "dir".
+        self._exclude_dirs = _compile(p[:-3] for p in self.exclude if p.endswith("/**"))
+        self._exclude_all = any(p in {"*", "**"} for p in self.exclude)
+        # Every path matched by an include glob starts with its literal prefix.
+        self._include_prefixes = [
+            _fold(_WILDCARDS.split(p, maxsplit=1)[0]) for p in self.include
+        ]
+
+    def included(self, rel_path: str) -> bool:
+        return self._include is not None and bool(self._include.match(_fold(rel_path)))
+
+    def excluded(self, rel_path: str) -> bool:
+        return self._exclude is not None and bool(self._exclude.match(_fold(rel_path)))
+
+    def matches(self, rel_path: str) -> bool:
+        """Return True if *rel_path* is included and not excluded."""
+        return self.included(rel_path) and not self.excluded(rel_path)
+
+    def skip_dir(self, rel_dir: str) -> bool:
+        """Return True if no file below *rel_dir* can match."""
+        if self._exclude_all:
+            return True
+        folded = _fold(rel_dir)
+        if self._exclude_dirs is not None and self._exclude_dirs.match(folded):
+            return True
+        below = f"{folded}/"
+        return not any(
+            below.startswith(prefix) or prefix.startswith(below)
+            for prefix in self._include_prefixes
+        )
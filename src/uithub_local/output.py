@@ -0,0 +1,55 @@
+"""Open dump files for writing, optionally through a compressor."""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Dict, TextIO, cast
+
+COMPRESSIONS = ("gzip", "xz", "zstd")
+SUFFIXES: Dict[str, str] = {
+    ".gz": "gzip",
+    ".gzip": "gzip",
+    ".xz": "xz",
+    ".zst": "zstd",
+    ".zstd": "zstd",
+}
+
+
+def infer_compression(path: Path) -> str | None:
+    """Return the compression implied by the suffix of *path*, if any."""
+    return SUFFIXES.get(path.suffix.lower())
+
+
+def open_output(
+    path: Path, encoding: str = "utf-8", compression: str | None = None
+) -> TextIO:
+    """Open *path* for writing text, compressing it on the fly.
+
+    *compression* is one of :data:`COMPRESSIONS` or ``None`` for plain text.
+    Output is encoded with *encoding* and replacement characters, and written
+    through the compressor as it arrives, so the uncompressed dump is never
+    held in memory or written to disk. ``zstd`` needs the optional
+    ``zstandard`` package.
+    """
+    if compression is None:
+        return open(path, "w", encoding=encoding, errors="replace")
+    if compression == "gzip":
+        import gzip
+
+        return gzip.open(path, "wt", encoding=encoding, errors="replace")
+    if compression == "xz":
+        import lzma
+
+        return lzma.open(path, "wt", encoding=encoding, errors="replace")
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError as exc:
+            raise RuntimeError(
+                "zstd compression requires the 'zstandard' package "
+                "(pip install 'uithub-local[zstd]')"
+            ) from exc
+        return cast(
+            TextIO, zstandard.open(path, "wt", encoding=encoding, errors="replace")
+        )
+    raise ValueError(f"Unsupported compression: {compression}")
@@ -2,80 +2,526 @@
 
 from __future__ import annotations
 
+import base64
+import copy
+import hashlib
+import io
+import itertools
 import json
+import os
+import zlib
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import List
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Protocol, Tuple
 import html
 
 from .loader import load_text
-from .tokenizer import approximate_tokens
+from .tokenizer import (
+    ENCODING_NAME,
+    EXACT_MARGIN,
+    approximate_tokens,
+    count_tokens_batch,
+    estimate_tokens,
+    split_tokens,
+    token_model,
+    truncate_tokens,
+)
+from .output import open_output
+from .utils import imap_ordered, path_binary_level, resolve_jobs
+from .utils import prefetch as _prefetch
 from .walker import FileInfo
 
+if TYPE_CHECKING:
+    from .cache import ScanCache
+
+# queue size between walk, load and write stages in pipelined renders
+PIPELINE_DEPTH = 64
+# files handed to the tokenizer at once
+TOKEN_BATCH = 256
+# file contents kept in memory by render_to before files are re-read on write
+RETAIN_BYTES = 64 * 1024 * 1024
+
+# zlib level for file bodies in the lazy HTML format
+LAZY_LEVEL = 6
+
+_LAZY_STYLE = """
+        <style>
+        .filter {
+            width:100%;
+            box-sizing:border-box;
+            margin:.75rem 0 .25rem;
+            padding:.45rem .6rem;
+            font:inherit;
+            color:inherit;
+            background:#0d1117;
+            border:1px solid #30363d;
+            border-radius:6px;
+        }
+        .filter:focus-visible {
+            outline:2px solid #58a6ff;
+        }
+        details.file-card[hidden] {display:none;}
+        </style>
+        """
+
+# Decodes a card's payload (deflate + base64) on first open, and filters
+# cards by a case-insensitive substring of their path.
+_LAZY_SCRIPT = """
+(function () {
+  function decode(card) {
+    var payload = card.querySelector("script");
+    var code = card.querySelector("code");
+    if (!payload || !code) return;
+    var raw = atob(payload.textContent);
+    payload.remove();
+    var bytes = new Uint8Array(raw.length);
+    for (var i = 0; i < raw.length; i++) bytes[i] = raw.charCodeAt(i);
+    if (typeof DecompressionStream === "undefined") {
+      code.textContent = "This browser cannot decompress the file contents.";
+      return;
+    }
+    var stream = new Blob([bytes]).stream()
+      .pipeThrough(new DecompressionStream("deflate"));
+    new Response(stream).text().then(function (text) {
+      code.textContent = text;
+    });
+  }
+  document.addEventListener("toggle", function (event) {
+    var card = event.target;
+    if (card.open && card.classList.contains("file-card")) decode(card);
+  }, true);
+  var cards = document.querySelectorAll("details.file-card");
+  var filter = document.querySelector(".filter");
+  var shown = document.querySelector(".shown");
+  filter.addEventListener("input", function () {
+    var query = filter.value.trim().toLowerCase();
+    var count = 0;
+    for (var i = 0; i < cards.length; i++) {
+      var path = cards[i].getAttribute("data-path").toLowerCase();
+      var hide = query !== "" && path.indexOf(query) === -1;
+      cards[i].hidden = hide;
+      if (!hide) count++;
+    }
+    shown.textContent = query ? count + " of " + cards.length + " files"
+      : cards.length + " files";
+  });
+})();
+"""
+
+
+class Writer(Protocol):
+    """Anything with a text ``write`` method, such as an open text file."""
+
+    def write(self, text: str, /) -> object: ...
+
 
 class FileDump:
-    """A file plus its loaded contents and token count."""
+    """A file plus its loaded contents and token count.
 
-    def __init__(self, info: FileInfo, root: Path) -> None:
+    With ``count=False`` the file is only tokenized if the scan cache already
+    knows its count; otherwise ``counted`` stays False so callers can tokenize
+    files in batches and report the result through :meth:`set_tokens`.
+    With ``lookup=False`` the scan cache is not consulted, and the file not
+    hashed, until :meth:`lookup` is called.
+    After :meth:`release` the contents are read from disk again on access,
+    or through the ``reader`` of files that do not live on disk.
+    """
+
+    def __init__(
+        self,
+        info: FileInfo,
+        root: Path,
+        cache: ScanCache | None = None,
+        model: str | None = None,
+        *,
+        count: bool = True,
+        lookup: bool = True,
+        encoding_model: str = ENCODING_NAME,
+    ) -> None:
         self.path = info.path
         self.full_path = root / info.path
         self.size = info.size
         self.tokens = 0
-        self.content = ""
+        self.counted = False
+        self.exact = False
+        self._content: str | None = ""
+        self._cache = cache
+        self._model = model
+        self._encoding_model = encoding_model
+        self._sha: str | None = None
+        self._reader = info.reader
+        self._info, self._root = info, root
         try:
-            self.content = load_text(self.full_path)
-            self.tokens = approximate_tokens(self.content)
+            if info.text is not None:
+                self._content = info.text
+            else:
+                self._content = self._read()
+            if lookup:
+                self.lookup()
         except Exception:
-            self.content = ""
-            self.tokens = 0
+            self._content = ""
+            self.tokens, self.counted, self.exact = 0, True, True
+        if not self.counted and count:
+            self.set_tokens(approximate_tokens(self.content, encoding=encoding_model))
+
+    @property
+    def content(self) -> str:
+        if self._content is not None:
+            return self._content
+        try:
+            return self._read()
+        except Exception:
+            return ""
+
+    def _read(self) -> str:
+        if self._reader is not None:
+            return self._reader()
+        return load_text(self.full_path)
+
+    def release(self) -> None:
+        """Drop the loaded contents to save memory."""
+        self._content = None
+
+    def truncated(self, tokens: int) -> FileDump:
+        """Return a copy cut to its first *tokens* tokens."""
+        part = copy.copy(self)
+        part._content = truncate_tokens(
+            self.content, tokens, encoding=self._encoding_model
+        )
+        part.tokens = tokens
+        return part
+
+    def split(self, tokens: int) -> List[FileDump]:
+        """Return copies holding consecutive pieces of at most *tokens* tokens."""
+        parts = []
+        pieces = split_tokens(self.content, tokens, encoding=self._encoding_model)
+        for text, count in pieces:
+            part = copy.copy(self)
+            part._content, part.tokens = text, count
+            parts.append(part)
+        return parts
+
+    def lookup(self) -> None:
+        """Take an exact count from the scan cache if it holds one."""
+        if self.exact or self._cache is None:
+            return
+        cached = self._cached_tokens(self._info, self._root, self._cache)
+        if cached is not None:
+            self.tokens, self.counted, self.exact = cached, True, True
+
+    def _cached_tokens(
+        self, info: FileInfo, root: Path, cache: ScanCache
+    ) -> int | None:
+        self._model = self._model or token_model(self._encoding_model)
+        root_key = os.fspath(root.resolve())
+        rel = info.path.as_posix()
+        record = cache.lookup(root_key, rel, info.size, info.mtime)
+        self._sha = record.sha if record is not None else None
+        if self._sha is not None:
+            return cache.tokens(self._sha, self._model)
+        self._sha = hashlib.sha256(self.content.encode("utf-8")).hexdigest()
+        level = path_binary_level(self.full_path)
+        cache.store(root_key, rel, info.size, info.mtime, level=level, sha=self._sha)
+        return None
+
+    def set_tokens(self, tokens: int, *, exact: bool = True) -> None:
+        """Record a token count, persisting exact counts to the scan cache."""
+        self.tokens, self.counted, self.exact = tokens, True, exact
+        if exact and self._cache is not None and self._sha is not None and self._model:
+            self._cache.store_tokens(self._sha, self._model, tokens)
 
 
 class Dump:
     def __init__(
         self,
-        files: List[FileInfo],
+        files: Iterable[FileInfo],
         root: Path,
         max_tokens: int | None = None,
+        cache: ScanCache | None = None,
+        *,
+        prefetch: int = 0,
+        jobs: int = 1,
+        tokenizer: str = "exact",
+        encoding_model: str = ENCODING_NAME,
+        retain: int | None = None,
+        partial: bool = False,
     ) -> None:
+        """Load and tokenize *files* under *root*.
+
+        Files are tokenized with the tiktoken ``encoding_model`` in batches of
+        ``TOKEN_BATCH`` on ``jobs`` threads.
+        The ``fast`` tokenizer estimates counts from file size and extension
+        instead, unless the estimated total comes within ``EXACT_MARGIN`` of
+        ``max_tokens``, in which case exact counts decide what is kept. With
+        ``max_tokens`` only the files that survive packing are tokenized
+        exactly, and ``partial`` cuts the next file to fill the budget.
+        With ``prefetch`` > 0 the stages run as a pipeline: *files* is
+        iterated in one background thread and files are loaded and tokenized
+        in another, each handing results on through a queue of that size.
+        The resulting dump is identical to the sequential one.
+        Once ``retain`` bytes of file contents are held in memory, the
+        contents of further files are dropped after tokenizing and read again
+        when the dump is written.
+        """
         self.root = root
-        self.file_dumps: List[FileDump] = [FileDump(info, root) for info in files]
+        self.max_tokens = max_tokens
+        self.cache = cache
+        self.jobs = jobs
+        self.encoding_model = encoding_model
+        self.retain = retain
+        self._retained = 0
+        self.partial = partial
+        self._fast = tokenizer == "fast"
+        # fast dumps resolve the model when a file is first counted exactly
+        self._model = None
+        if cache is not None and not self._fast:
+            self._model = token_model(encoding_model)
+        # with a budget, exact counts wait until the packer picks survivors
+        self._estimate = self._fast or max_tokens is not None
+        loaded = self._pipeline(files, prefetch)
+        # every loaded file keyed by posix path, in walk order
+        self._loaded: Dict[str, FileDump] = {fd.path.as_posix(): fd for fd in loaded}
+        self._select()
+
+    def _pipeline(self, files: Iterable[FileInfo], prefetch: int) -> Iterator[FileDump]:
+        if prefetch > 0:
+            return _prefetch(self._load(_prefetch(files, prefetch)), prefetch)
+        return self._load(files)
+
+    def __contains__(self, rel_path: object) -> bool:
+        return rel_path in self._loaded
+
+    def _load(self, files: Iterable[FileInfo]) -> Iterator[FileDump]:
+        batch: List[FileDump] = []
+        for info in files:
+            batch.append(
+                FileDump(
+                    info,
+                    self.root,
+                    self.cache,
+                    self._model,
+                    count=False,
+                    lookup=not self._fast,
+                    encoding_model=self.encoding_model,
+                )
+            )
+            if len(batch) >= TOKEN_BATCH:
+                yield from self._release(self._count(batch))
+                batch = []
+        yield from self._release(self._count(batch))
+
+    def _count(self, batch: List[FileDump]) -> List[FileDump]:
+        pending = [fd for fd in batch if not fd.counted]
+        if not pending:
+            return batch
+        if self._estimate:
+            for fd in pending:
+                fd.set_tokens(estimate_tokens(fd.size, fd.path.suffix), exact=False)
+            return batch
+        self._count_exact(pending)
+        return batch
+
+    def _count_exact(self, pending: List[FileDump]) -> None:
+        if self._fast:
+            # estimates skip the scan cache, and with it hashing every file
+            for fd in pending:
+                fd.lookup()
+            pending = [fd for fd in pending if not fd.exact]
+        if not pending:
+            return
+        counts = count_tokens_batch(
+            [fd.content for fd in pending],
+            jobs=self.jobs,
+            encoding=self.encoding_model,
+        )
+        for fd, tokens in zip(pending, counts):
+            fd.set_tokens(tokens)
+
+    def _release(self, batch: List[FileDump]) -> List[FileDump]:
+        if self.retain is None:
+            return batch
+        for fd in batch:
+            self._retained += fd.size
+            if self._retained > self.retain:
+                fd.release()
+        return batch
+
+    def _select(self) -> None:
+        self.file_dumps: List[FileDump] = list(self._loaded.values())
         self.total_tokens = sum(fd.tokens for fd in self.file_dumps)
-        if max_tokens is not None and self.total_tokens > max_tokens:
-            self._truncate(max_tokens)
+        if self.max_tokens is None:
+            return
+        if self._fast and self.total_tokens <= self.max_tokens * (1 - EXACT_MARGIN):
+            return  # comfortably within budget, estimates are good enough
+        self._pack(self.max_tokens)
+
+    def update(self, changed: Iterable[FileInfo], removed: Iterable[str] = ()) -> None:
+        """Reload *changed* files and drop *removed* posix paths.
+
+        Only the named files are read and tokenized again; every other
+        ``FileDump`` is reused.
+        """
+        for rel in removed:
+            self._loaded.pop(rel, None)
+        added = False
+        for fd in self._load(changed):
+            rel = fd.path.as_posix()
+            added = added or rel not in self._loaded
+            self._loaded[rel] = fd
+        if added:
+            # sorted posix paths equal the walker's (git) order
+            self._loaded = dict(sorted(self._loaded.items()))
+        self._select()
+
+    def _pack(self, limit: int) -> None:
+        """Keep the smallest files that fit in *limit* tokens, in walk order.
 
-    def _truncate(self, limit: int) -> None:
-        self.file_dumps.sort(key=lambda f: (f.tokens, f.path.as_posix()), reverse=True)
-        while self.total_tokens > limit and self.file_dumps:
-            victim = self.file_dumps.pop(0)
-            self.total_tokens -= victim.tokens
+        Files are visited cheapest first by their current (usually estimated)
+        count and counted exactly in batches until the exact running total
+        passes *limit*; files beyond that point are dropped without ever
+        being tokenized. The counted files are then packed smallest first,
+        which drops the largest files, as before. With ``partial`` the
+        remaining budget is filled with the start of the next file.
+        """
+
+        def _key(fd: FileDump) -> Tuple[int, str]:
+            return fd.tokens, fd.path.as_posix()
+
+        order = sorted(self.file_dumps, key=_key)
+        seen = total = 0
+        while seen < len(order) and total <= limit:
+            batch = order[seen : seen + TOKEN_BATCH]
+            self._count_exact([fd for fd in batch if not fd.exact])
+            total += sum(fd.tokens for fd in batch)
+            seen += len(batch)
+        counted = sorted(order[:seen], key=_key)
+        kept: Dict[int, FileDump] = {}
+        total = 0
+        for fd in counted:
+            if total + fd.tokens > limit:
+                if self.partial and total < limit:
+                    kept[id(fd)] = fd.truncated(limit - total)
+                    total = limit
+                break
+            kept[id(fd)] = fd
+            total += fd.tokens
+        self.file_dumps = [kept[id(fd)] for fd in self.file_dumps if id(fd) in kept]
+        self.total_tokens = total
+
+    def shards(self, limit: int) -> List[Dump]:
+        """Split the dump into self-contained dumps of at most *limit* tokens.
+
+        Files keep their walk order. A directory stays in one shard when it
+        fits in *limit*; otherwise its subdirectories and files are placed
+        separately. A single file above *limit* is split at token boundaries
+        across consecutive shards. Files that only have estimated counts
+        (``tokenizer="fast"``) are tokenized exactly first, so every shard
+        really stays within *limit*.
+        """
+        estimated = [fd for fd in self.file_dumps if not fd.exact]
+        if estimated:
+            self._count_exact(estimated)
+            self.total_tokens = sum(fd.tokens for fd in self.file_dumps)
+        shards: List[List[FileDump]] = []
+        current: List[FileDump] = []
+        size = 0
+        for group in _groups(self.file_dumps, limit):
+            tokens = sum(fd.tokens for fd in group)
+            if current and size + tokens > limit:
+                shards.append(current)
+                current, size = [], 0
+            if tokens > limit:  # only single files are larger than a shard
+                *full, last = group[0].split(limit)
+                shards.extend([part] for part in full)
+                group, tokens = [last], last.tokens
+            current.extend(group)
+            size += tokens
+        if current or not shards:
+            shards.append(current)
+        return [self._subset(file_dumps) for file_dumps in shards]
+
+    def _subset(self, file_dumps: List[FileDump]) -> Dump:
+        part = copy.copy(self)
+        part.file_dumps = file_dumps
+        part.total_tokens = sum(fd.tokens for fd in file_dumps)
+        return part
+
+    def write(
+        self, stream: Writer, fmt: str = "text", *, indent: int | None = 2
+    ) -> None:
+        """Write the dump to *stream* in *fmt*, one file at a time.
+
+        Only one file's contents are rendered at a time, so together with
+        ``retain`` memory stays bounded by the largest file rather than the
+        size of the dump. *indent* applies to ``json``; ``None`` writes it
+        compactly.
+        """
+        repo_name = _repo_name(self.root)
+        chunks: Iterable[str]
+        if fmt == "json":
+            chunks = self._json_chunks(repo_name, indent)
+        elif fmt == "jsonl":
+            chunks = _jsonl_chunks(self.file_dumps, repo_name)
+        elif fmt == "html":
+            chunks = self._html_chunks(repo_name)
+        elif fmt == "html-lazy":
+            chunks = self._html_chunks(repo_name, lazy=True)
+        else:
+            chunks = self._text_chunks(repo_name)
+        for chunk in chunks:
+            stream.write(chunk)
 
     def as_text(self, repo_name: str) -> str:
+        return "".join(self._text_chunks(repo_name))
+
+    def _text_chunks(self, repo_name: str) -> Iterator[str]:
         timestamp = datetime.now(timezone.utc).isoformat()
-        lines = [f"# Uithub-local dump – {repo_name} – {timestamp}"]
-        lines.append(f"# ≈ {self.total_tokens} tokens")
+        yield f"# Uithub-local dump – {repo_name} – {timestamp}"
+        yield f"\n# ≈ {self.total_tokens} tokens"
         for fd in self.file_dumps:
-            lines.append(f"\n### {fd.path.as_posix()}")
-            lines.append(fd.content)
-        lines.append("")
-        return "\n".join(lines)
-
-    def as_json(self, repo_name: str) -> str:
-        obj = {
-            "repo": repo_name,
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "total_tokens": self.total_tokens,
-            "files": [
-                {
-                    "path": fd.path.as_posix(),
-                    "contents": fd.content,
-                    "tokens": fd.tokens,
-                }
-                for fd in self.file_dumps
-            ],
-        }
-        return json.dumps(obj, indent=2)
+            yield f"\n\n### {fd.path.as_posix()}\n"
+            yield fd.content
+        yield "\n"
+
+    def as_json(self, repo_name: str, indent: int | None = 2) -> str:
+        return "".join(self._json_chunks(repo_name, indent))
+
+    def _json_chunks(self, repo_name: str, indent: int | None) -> Iterator[str]:
+        # Matches json.dumps(obj, indent=indent) of the whole dump, but encodes
+        # one file object at a time. Encoded JSON has no raw newlines inside
+        # strings, so nested objects can be re-indented line by line.
+        head = json.dumps(
+            {
+                "repo": repo_name,
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "total_tokens": self.total_tokens,
+                "files": [],
+            },
+            indent=indent,
+        )
+        prefix, _, suffix = head.rpartition("[]")
+        yield prefix
+        if not self.file_dumps:
+            yield "[]"
+        else:
+            if indent is None:
+                sep, inner, outer = ", ", "", ""
+            else:
+                sep, inner, outer = ",", "\n" + " " * 2 * indent, "\n" + " " * indent
+            yield "["
+            for i, fd in enumerate(self.file_dumps):
+                record = json.dumps(_file_record(fd), indent=indent)
+                yield (sep if i else "") + inner + record.replace("\n", inner)
+            yield outer + "]"
+        yield suffix
 
     def as_html(self, repo_name: str) -> str:
+        return "".join(self._html_chunks(repo_name))
+
+    def as_lazy_html(self, repo_name: str) -> str:
+        return "".join(self._html_chunks(repo_name, lazy=True))
+
+    def _html_chunks(self, repo_name: str, lazy: bool = False) -> Iterator[str]:
         timestamp = datetime.now(timezone.utc).isoformat()
         style = """
         <style>
@@ -176,6 +622,8 @@ class Dump:
         }
         </style>
         """
+        if lazy:
+            style += _LAZY_STYLE
         lines = [
             "<!DOCTYPE html>",
             '<html lang="en">',
@@ -190,39 +638,220 @@ class Dump:
             "<div class='header-card'>",
             f"<h1>Uithub-local dump – {repo_name}</h1>",
             f"<p>{timestamp} \u00b7 \u2248 {self.total_tokens} tokens</p>",
-            "</div>",
         ]
+        if lazy:
+            lines.append(
+                "<input type='search' class='filter' placeholder='Filter paths'"
+                " aria-label='Filter paths' autocomplete='off'>"
+                f"<p class='shown'>{len(self.file_dumps)} files</p>"
+            )
+        lines.append("</div>")
+        yield "\n".join(lines)
         for fd in self.file_dumps:
             path = html.escape(fd.path.as_posix())
-            lines.append("<details class='file-card'>")
-            lines.append(
-                "<summary>"
+            card = "\n<details class='file-card'>\n"
+            if lazy:
+                card = f"\n<details class='file-card' data-path='{path}'>\n"
+            yield (
+                card + "<summary>"
                 "<svg class='chevron' width='10' height='10'"
                 " viewBox='0 0 8 8' aria-hidden='true'>"
                 "<path d='M0 0 L6 4 L0 8z'/></svg>"
                 f"<span class='path'>{path}</span>"
-                "</summary>"
+                "</summary>\n"
+                "<pre><code>\n"
             )
-            lines.append("<pre><code>")
-            lines.append(html.escape(fd.content))
-            lines.append("</code></pre>")
-            lines.append("</details>")
-        lines.append("</div></body></html>")
-        return "\n".join(lines)
+            if lazy:
+                # the body stays an inert, compressed script payload until opened
+                body = zlib.compress(fd.content.encode("utf-8"), LAZY_LEVEL)
+                yield "</code></pre>\n<script type='application/x-deflate-base64'>"
+                yield base64.b64encode(body).decode("ascii")
+                yield "</script>\n</details>"
+                continue
+            yield html.escape(fd.content)
+            yield "\n</code></pre>\n</details>"
+        if lazy:
+            yield f"\n<script>{_LAZY_SCRIPT}</script>"
+        yield "\n</div></body></html>"
 
 
 def render(
-    files: List[FileInfo],
+    files: Iterable[FileInfo],
     root: Path,
     *,
     max_tokens: int | None = None,
     fmt: str = "text",
+    cache: ScanCache | None = None,
+    prefetch: int = 0,
+    jobs: int = 1,
+    tokenizer: str = "exact",
+    encoding_model: str = ENCODING_NAME,
+    partial: bool = False,
+    indent: int | None = 2,
 ) -> str:
-    dump = Dump(files, root, max_tokens)
+    dump = Dump(
+        files,
+        root,
+        max_tokens,
+        cache,
+        prefetch=prefetch,
+        jobs=jobs,
+        tokenizer=tokenizer,
+        encoding_model=encoding_model,
+        partial=partial,
+    )
+    return render_dump(dump, fmt=fmt, indent=indent)
+
+
+def _file_record(fd: FileDump) -> Dict[str, object]:
+    return {"path": fd.path.as_posix(), "contents": fd.content, "tokens": fd.tokens}
+
+
+def _jsonl_chunks(file_dumps: Iterable[FileDump], repo_name: str) -> Iterator[str]:
+    # one record per file, then a summary record with the totals
+    files = tokens = 0
+    for fd in file_dumps:
+        yield json.dumps({"type": "file", **_file_record(fd)}) + "\n"
+        files += 1
+        tokens += fd.tokens
+    summary = {
+        "type": "summary",
+        "repo": repo_name,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "total_tokens": tokens,
+        "files": files,
+    }
+    yield json.dumps(summary) + "\n"
+
+
+def render_to(
+    stream: Writer,
+    files: Iterable[FileInfo],
+    root: Path,
+    *,
+    max_tokens: int | None = None,
+    fmt: str = "text",
+    cache: ScanCache | None = None,
+    prefetch: int = 0,
+    jobs: int = 1,
+    tokenizer: str = "exact",
+    encoding_model: str = ENCODING_NAME,
+    partial: bool = False,
+    retain: int | None = RETAIN_BYTES,
+    indent: int | None = 2,
+) -> None:
+    """Like :func:`render`, but write the dump to *stream* incrementally.
+
+    At most ``retain`` bytes of file contents are kept between tokenizing and
+    writing; later files are read again as they are written. ``jsonl`` dumps
+    without ``max_tokens`` are written while files are still being loaded,
+    since every file is kept and the totals come last.
+    """
+    if fmt == "jsonl" and max_tokens is None:
+        dump = Dump(
+            (),
+            root,
+            cache=cache,
+            jobs=jobs,
+            tokenizer=tokenizer,
+            encoding_model=encoding_model,
+        )
+        loaded = dump._pipeline(files, prefetch)
+        for chunk in _jsonl_chunks(loaded, _repo_name(root)):
+            stream.write(chunk)
+        return
+    dump = Dump(
+        files,
+        root,
+        max_tokens,
+        cache,
+        prefetch=prefetch,
+        jobs=jobs,
+        tokenizer=tokenizer,
+        encoding_model=encoding_model,
+        retain=retain,
+        partial=partial,
+    )
+    dump.write(stream, fmt, indent=indent)
+
+
+def render_shards(
+    files: Iterable[FileInfo],
+    root: Path,
+    outfile: Path,
+    shard_tokens: int,
+    *,
+    max_tokens: int | None = None,
+    fmt: str = "text",
+    cache: ScanCache | None = None,
+    prefetch: int = 0,
+    jobs: int = 1,
+    tokenizer: str = "exact",
+    encoding_model: str = ENCODING_NAME,
+    partial: bool = False,
+    indent: int | None = 2,
+    encoding: str = "utf-8",
+    compression: str | None = None,
+) -> List[Path]:
+    """Write the dump as shards of at most *shard_tokens* tokens.
+
+    Files are walked and tokenized once (see :meth:`Dump.shards` for how
+    they are grouped). Shard *n* goes to *outfile* with ``{n}`` replaced by
+    *n*, starting at 1, and shards are written on ``jobs`` threads. Returns
+    the written paths in order.
+    """
+    dump = Dump(
+        files,
+        root,
+        max_tokens,
+        cache,
+        prefetch=prefetch,
+        jobs=jobs,
+        tokenizer=tokenizer,
+        encoding_model=encoding_model,
+        retain=RETAIN_BYTES,
+        partial=partial,
+    )
+    shards = dump.shards(shard_tokens)
+    paths = [
+        Path(str(outfile).replace("{n}", str(n))) for n in range(1, len(shards) + 1)
+    ]
+
+    def _write(item: Tuple[Dump, Path]) -> Path:
+        shard, path = item
+        with open_output(path, encoding, compression) as stream:
+            shard.write(stream, fmt, indent=indent)
+        return path
+
+    return list(imap_ordered(_write, zip(shards, paths), resolve_jobs(jobs)))
+
+
+def _groups(
+    file_dumps: List[FileDump], limit: int, depth: int = 0
+) -> Iterator[List[FileDump]]:
+    # runs of files to keep together: whole directories while they fit
+    if sum(fd.tokens for fd in file_dumps) <= limit:
+        yield file_dumps
+        return
+
+    def _child(fd: FileDump) -> str | None:
+        parts = fd.path.parts
+        return parts[depth] if len(parts) > depth + 1 else None
+
+    for child, run in itertools.groupby(file_dumps, key=_child):
+        if child is None:
+            yield from ([fd] for fd in run)
+        else:
+            yield from _groups(list(run), limit, depth + 1)
+
+
+def render_dump(dump: Dump, *, fmt: str = "text", indent: int | None = 2) -> str:
+    """Render an already loaded :class:`Dump` in *fmt*."""
+    buffer = io.StringIO()
+    dump.write(buffer, fmt, indent=indent)
+    return buffer.getvalue()
+
+
+def _repo_name(root: Path) -> str:
     resolved = root.resolve()
-    repo_name = resolved.name or resolved.parent.name
-    if fmt == "json":
-        return dump.as_json(repo_name)
-    if fmt == "html":
-        return dump.as_html(repo_name)
-    return dump.as_text(repo_name)
+    return resolved.name or resolved.parent.name
@@ -3,27 +3,155 @@
 from __future__ import annotations
 
 import mimetypes
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
+from typing import Any, Callable, Deque, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
 
 ASCII_WHITELIST = set(b"\t\n\r")
+# Bytes counted as text by the strict heuristic; ``bytes.translate`` deletes
+# them in C so only the non-text remainder has to be measured.
+TEXT_BYTES = bytes(b for b in range(256) if 32 <= b <= 126 or b in ASCII_WHITELIST)
+SNIFF_SIZE = 8192
+# what sniffing a file found, from most to least text-like: only ``BINARY``
+# files (with NUL bytes) are skipped without strict detection, ``NOISY`` ones
+# (over 30% non-text bytes) only with it
+TEXT, NOISY, BINARY = 0, 1, 2
 
 
-def is_binary_path(path: Path, *, strict: bool = True) -> bool:
-    """Return True if file looks binary."""
-    mime, _ = mimetypes.guess_type(path.as_posix())
-    if mime is not None and not mime.startswith("text"):
-        return True
+@lru_cache(maxsize=1024)
+def _binary_suffix(suffix: str) -> bool:
+    mime, _ = mimetypes.guess_type(f"x{suffix}")
+    return mime is not None and not mime.startswith("text")
+
+
+def has_binary_suffix(path: Path) -> bool:
+    """Return True if the file extension maps to a non-text MIME type."""
+    return _binary_suffix("".join(path.suffixes[-2:]))
+
+
+def binary_level(chunk: bytes) -> int:
+    """Return ``TEXT``, ``NOISY`` or ``BINARY`` for the start of a file."""
+    if b"\0" in chunk:
+        return BINARY
+    if chunk:
+        non_text = len(chunk.translate(None, TEXT_BYTES))
+        if non_text / len(chunk) > 0.30:
+            return NOISY
+    return TEXT
+
+
+def is_binary_level(level: int, *, strict: bool = True) -> bool:
+    """Return True if a file of binary *level* is skipped under *strict*."""
+    return level >= (NOISY if strict else BINARY)
+
+
+def is_binary_bytes(chunk: bytes, *, strict: bool = True) -> bool:
+    """Return True if *chunk* looks like the start of a binary file."""
+    return is_binary_level(binary_level(chunk), strict=strict)
+
+
+def path_binary_level(path: Path) -> int:
+    """Return the :func:`binary_level` of *path*; unreadable files are binary."""
+    if has_binary_suffix(path):
+        return BINARY
     try:
         with open(path, "rb") as fh:
-            chunk = fh.read(8192)
-        if b"\0" in chunk:
-            return True
-        if strict and chunk:
-            non_text = sum(
-                1 for b in chunk if not (32 <= b <= 126 or b in ASCII_WHITELIST)
-            )
-            if non_text / len(chunk) > 0.30:
+            return binary_level(fh.read(SNIFF_SIZE))
+    except OSError:
+        return BINARY
+
+
+def is_binary_path(path: Path, *, strict: bool = True) -> bool:
+    """Return True if file looks binary."""
+    return is_binary_level(path_binary_level(path), strict=strict)
+
+
+def resolve_jobs(jobs: int | None) -> int:
+    """Return a worker count; ``None`` or values below 1 mean one per CPU."""
+    if jobs is None or jobs < 1:
+        return os.cpu_count() or 1
+    return jobs
+
+
+def imap_ordered(
+    func: Callable[[T], R], items: Iterable[T], jobs: int, *, window: int = 0
+) -> Iterator[R]:
+    """Lazily map *func* over *items* on *jobs* threads, preserving order.
+
+    At most *window* calls (default ``4 * jobs``) are in flight, so *items*
+    is consumed incrementally rather than submitted all at once.
+    """
+    if jobs <= 1:
+        yield from map(func, items)
+        return
+    window = window or 4 * jobs
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        pending: Deque[Future[R]] = deque()
+        for item in items:
+            pending.append(pool.submit(func, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+_DONE = object()
+
+
+def prefetch(items: Iterable[T], size: int) -> Iterator[T]:
+    """Iterate *items* in a background thread through a bounded queue.
+
+    Up to *size* items are produced ahead of the consumer, which lets the
+    producing stage overlap with whatever the consumer does. Exceptions are
+    re-raised in the consumer; closing the iterator stops the producer.
+    """
+    buffer: queue.Queue[Any] = queue.Queue(maxsize=max(1, size))
+    stop = threading.Event()
+
+    def _put(item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
                 return True
+            except queue.Full:
+                continue
         return False
-    except OSError:
-        return True
+
+    def _produce() -> None:
+        try:
+            for item in items:
+                if not _put(item):
+                    return
+        except BaseException as exc:  # forwarded to the consumer
+            _put(_Raised(exc))
+            return
+        _put(_DONE)
+
+    thread = threading.Thread(target=_produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Raised):
+                raise item.exc
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+class _Raised:
+    __slots__ = ("exc",)
+
+    def __init__(self, exc: BaseException) -> None:
+        self.exc = exc
@@ -2,13 +2,40 @@
 
 from __future__ import annotations
 
-import fnmatch
+import functools
 import os
-from dataclasses import dataclass
+import threading
+import time
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Iterable, List
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Protocol,
+    Set,
+    Tuple,
+)
 
-from .utils import is_binary_path
+from .gitindex import IndexEntry, read_index
+from .ignore import IgnoreIndex, root_index
+from .loader import decode_text, ingest_level, load_text, sniff_text
+from .matcher import PathMatcher
+from .utils import (
+    has_binary_suffix,
+    imap_ordered,
+    is_binary_level,
+    path_binary_level,
+    resolve_jobs,
+)
+
+if TYPE_CHECKING:
+    import zipfile
+
+    from .cache import ScanCache
 
 DEFAULT_MAX_SIZE = 1_048_576
 
@@ -20,6 +47,10 @@ class FileInfo:
     path: Path
     size: int
     mtime: float
+    # decoded contents, when the walk was asked to ``load`` them
+    text: str | None = field(default=None, repr=False, compare=False)
+    # reads the contents again for files that do not live on disk
+    reader: Callable[[], str] | None = field(default=None, repr=False, compare=False)
 
 
 def collect_files(
@@ -29,9 +60,15 @@ def collect_files(
     max_size: int = DEFAULT_MAX_SIZE,
     *,
     binary_strict: bool = True,
+    gitignore: bool = True,
+    jobs: int = 1,
+    tracked_only: bool = False,
+    cache: ScanCache | None = None,
 ) -> List[FileInfo]:
     """Return list of readable, non-binary files under *path*.
 
+    See :func:`iter_files` for a lazily evaluated variant.
+
     Parameters
     ----------
     path:
@@ -44,47 +81,462 @@ def collect_files(
         Skip files larger than this number of bytes.
     binary_strict:
         Use strict binary detection.
+    gitignore:
+        Skip paths ignored by ``.gitignore`` files, ``.git/info/exclude`` and
+        the global git excludes file. Like git, this only applies when
+        *path* is inside a git work tree.
+    jobs:
+        Number of worker threads used to stat and sniff files. ``0`` or less
+        uses one worker per CPU.
+    tracked_only:
+        Enumerate files from the git index instead of walking the directory
+        tree. Untracked files are skipped and ``gitignore`` has no effect.
+        Falls back to the walk when *path* has no readable index. Each file
+        is still stat'ed, since the index's stat data may be stale; when it
+        matches, the git blob id keys the file's token counts in *cache*, so
+        they are reused without hashing the contents.
+    cache:
+        Reuse binary classifications recorded for unchanged files.
+    """
+    return list(
+        iter_files(
+            path,
+            include,
+            exclude,
+            max_size,
+            binary_strict=binary_strict,
+            gitignore=gitignore,
+            jobs=jobs,
+            tracked_only=tracked_only,
+            cache=cache,
+        )
+    )
+
+
+def iter_files(
+    path: Path,
+    include: Iterable[str] | None = None,
+    exclude: Iterable[str] | None = None,
+    max_size: int = DEFAULT_MAX_SIZE,
+    *,
+    binary_strict: bool = True,
+    gitignore: bool = True,
+    jobs: int = 1,
+    tracked_only: bool = False,
+    cache: ScanCache | None = None,
+    load: bool = False,
+) -> Iterator[FileInfo]:
+    """Yield readable, non-binary files under *path* as they are found.
+
+    Takes the same arguments as :func:`collect_files` and yields the same
+    files in the same order, but walks and classifies lazily so later stages
+    can start before the walk finishes. With ``load`` each file is read once
+    and the buffer is used both for binary sniffing and as the ``text`` of
+    the yielded :class:`FileInfo`, so the renderer does not read it again.
     """
-    include = list(include or ["*"])
-    exclude = list(exclude or [])
-    files: List[FileInfo] = []
     root = Path(path)
+    root_key = os.fspath(root.resolve())
+    candidates = _candidates(root, include, exclude, gitignore, tracked_only)
+
+    def _classify_candidate(candidate: Tuple[str, _Candidate]) -> FileInfo | None:
+        rel_path, entry = candidate
+        return _classify(
+            root_key,
+            entry.path,
+            rel_path,
+            entry.stat,
+            max_size,
+            binary_strict,
+            cache,
+            load,
+            entry.index if isinstance(entry, _TrackedFile) else None,
+        )
+
+    for info in imap_ordered(_classify_candidate, candidates, resolve_jobs(jobs)):
+        if info is not None:
+            yield info
+
+
+def stat_files(
+    path: Path,
+    include: Iterable[str] | None = None,
+    exclude: Iterable[str] | None = None,
+    *,
+    gitignore: bool = True,
+    tracked_only: bool = False,
+) -> Dict[str, Tuple[int, float]]:
+    """Return ``{relative posix path: (size, mtime)}`` for candidate files.
+
+    Uses the same include/exclude, gitignore and tracked-only selection as
+    :func:`collect_files` but only stats files; nothing is opened or sniffed.
+    """
+    snapshot: Dict[str, Tuple[int, float]] = {}
+    for rel_path, entry in _candidates(
+        Path(path), include, exclude, gitignore, tracked_only
+    ):
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        snapshot[rel_path] = (stat.st_size, stat.st_mtime)
+    return snapshot
+
+
+def classify_file(
+    path: Path,
+    rel_path: str,
+    max_size: int = DEFAULT_MAX_SIZE,
+    *,
+    binary_strict: bool = True,
+    cache: ScanCache | None = None,
+) -> FileInfo | None:
+    """Return metadata for *rel_path* under *path*, or None if it is skipped.
+
+    Applies the same size, readability and binary checks as
+    :func:`collect_files` to a single file.
+    """
+    root = Path(path)
+    full_path = os.path.join(root, rel_path)
+    return _classify(
+        os.fspath(root.resolve()),
+        full_path,
+        rel_path,
+        lambda: os.stat(full_path),
+        max_size,
+        binary_strict,
+        cache,
+    )
+
+
+def archive_prefix(archive: zipfile.ZipFile) -> str:
+    """Return the top-level directory shared by every member, e.g. ``"repo/"``.
+
+    Hosted archives wrap the repository in one directory; ``""`` is returned
+    when the members do not share one.
+    """
+    tops = {name.split("/", 1)[0] for name in archive.namelist()}
+    if len(tops) != 1 or not all("/" in name for name in archive.namelist()):
+        return ""
+    return f"{tops.pop()}/"
+
+
+def iter_archive(
+    archive: zipfile.ZipFile,
+    include: Iterable[str] | None = None,
+    exclude: Iterable[str] | None = None,
+    max_size: int = DEFAULT_MAX_SIZE,
+    *,
+    binary_strict: bool = True,
+    gitignore: bool = True,
+    jobs: int = 1,
+) -> Iterator[FileInfo]:
+    """Yield readable, non-binary members of *archive* like :func:`iter_files`.
+
+    Paths are relative to :func:`archive_prefix`. Include/exclude globs,
+    ``.gitignore`` rules, binary suffixes and ``max_size`` are applied to the
+    central directory entries, so only accepted members (and ``.gitignore``
+    files) are ever decompressed. Accepted members are read straight from the
+    archive into the ``text`` of the yielded :class:`FileInfo`; nothing is
+    extracted to disk. *archive* must stay open while the files are used.
+    """
+    prefix = archive_prefix(archive)
+    members: Dict[str, zipfile.ZipInfo] = {}
+    directories: Set[str] = set()
+    for member in archive.infolist():
+        rel = member.filename[len(prefix) :]
+        if not rel or member.is_dir():
+            continue
+        members[rel] = member
+        parts = rel.split("/")[:-1]
+        directories.update("/".join(parts[: i + 1]) for i in range(len(parts)))
+
+    include = _expand_patterns(include or ["*"], directories.__contains__)
+    exclude = _expand_patterns(exclude or [], directories.__contains__)
+    matcher = PathMatcher(include, exclude)
+    reader = _ArchiveReader(archive)
+    # directory prefix ("" or "a/b/") -> ignore index; pruned ones are absent
+    indexes: Dict[str, IgnoreIndex | None] = {}
+    pruned: Set[str] = set()
+
+    def _enter(directory: str) -> bool:
+        # False when *directory* or one of its parents is pruned
+        if directory in indexes:
+            return True
+        if directory in pruned:
+            return False
+        if directory:
+            parent = directory[: directory[:-1].rfind("/") + 1]
+            entered = _enter(parent)
+            index = indexes.get(parent)
+            rel_dir = directory[:-1]
+            if (
+                not entered
+                or matcher.skip_dir(rel_dir)
+                or (index is not None and index.ignored(rel_dir, True))
+            ):
+                pruned.add(directory)
+                return False
+        else:
+            index = IgnoreIndex() if gitignore else None
+        rules = members.get(f"{directory}.gitignore")
+        if index is not None and rules is not None:
+            index = index.child(directory, reader.text(rules).splitlines())
+        indexes[directory] = index
+        return True
 
+    def _accepted() -> Iterator[Tuple[str, zipfile.ZipInfo]]:
+        # sorted posix paths equal the walker's (git) order
+        for rel in sorted(members):
+            directory = rel[: rel.rfind("/") + 1]
+            if not _enter(directory) or not matcher.matches(rel):
+                continue
+            index = indexes[directory]
+            if index is not None and index.ignored(rel):
+                continue
+            member = members[rel]
+            if has_binary_suffix(Path(rel)) or member.file_size > max_size:
+                continue
+            yield rel, member
+
+    def _load(candidate: Tuple[str, zipfile.ZipInfo]) -> FileInfo | None:
+        rel, member = candidate
+        try:
+            text = sniff_text(reader.read(member), strict=binary_strict)
+        except reader.errors:
+            return None
+        if text is None:
+            return None
+        return FileInfo(
+            path=Path(rel),
+            size=member.file_size,
+            mtime=time.mktime(member.date_time + (0, 0, -1)),
+            text=text,
+            reader=functools.partial(reader.text, member),
+        )
+
+    for info in imap_ordered(_load, _accepted(), resolve_jobs(jobs)):
+        if info is not None:
+            yield info
+
+
+class _ArchiveReader:
+    """Read members of an open zip archive from several threads."""
+
+    def __init__(self, archive: zipfile.ZipFile) -> None:
+        import zipfile
+        import zlib
+
+        self.archive = archive
+        # a damaged member fails on read with any of these
+        self.errors = (OSError, EOFError, zipfile.BadZipFile, zlib.error)
+        # ZipFile tracks open members with an unlocked reference count
+        self._lock = threading.Lock()
+
+    def read(self, member: zipfile.ZipInfo) -> bytes:
+        with self._lock:
+            handle = self.archive.open(member)
+        try:
+            return handle.read()
+        finally:
+            with self._lock:
+                handle.close()
+
+    def text(self, member: zipfile.ZipInfo) -> str:
+        try:
+            return decode_text(self.read(member))
+        except self.errors:
+            return ""
+
+
+def _expand_patterns(
+    patterns: Iterable[str], is_dir: Callable[[str], bool]
+) -> List[str]:
     def _expand(pattern: str) -> str:
         # normalize platform separators
         pat = pattern.replace("\\", "/").rstrip("/")
         if pat in {"*", "**"}:
             return pat
-        if (root / pat).is_dir():
+        if is_dir(pat):
             return f"{pat}/**"  # recurse
         return pattern
 
-    include = [_expand(p) for p in include]
-    exclude = [_expand(p) for p in exclude]
+    return [_expand(p) for p in patterns]
+
+
+def _candidates(
+    root: Path,
+    include: Iterable[str] | None,
+    exclude: Iterable[str] | None,
+    gitignore: bool,
+    tracked_only: bool,
+) -> Iterator[Tuple[str, _Candidate]]:
+    def _is_dir(pattern: str) -> bool:
+        return (root / pattern).is_dir()
+
+    include = _expand_patterns(include or ["*"], _is_dir)
+    exclude = _expand_patterns(exclude or [], _is_dir)
 
     if (root / ".git").is_dir():
         git_included = any(pat.lstrip("./").startswith(".git") for pat in include)
         if not git_included:
             exclude.append(".git/**")
 
-    for file in root.rglob("*"):
+    matcher = PathMatcher(include, exclude)
+    tracked = read_index(root) if tracked_only else None
+    found: Iterator[Tuple[str, _Candidate]]
+    if tracked is not None:
+        found = _tracked(root, tracked)
+    else:
+        ignore = root_index(root) if gitignore else None
+        found = _walk(root, matcher.skip_dir, ignore)
+    return (candidate for candidate in found if matcher.matches(candidate[0]))
+
+
+def _classify(
+    root_key: str,
+    full_path: str,
+    rel_path: str,
+    stat_file: Callable[[], os.stat_result],
+    max_size: int,
+    binary_strict: bool,
+    cache: ScanCache | None,
+    load: bool = False,
+    index: IndexEntry | None = None,
+) -> FileInfo | None:
+    try:
+        # cheapest checks first: extension, size, then file contents
+        file = Path(full_path)
+        if has_binary_suffix(file):
+            return None
+        stat = stat_file()
+        if stat.st_size > max_size:
+            return None
+        if not load and not os.access(file, os.R_OK):
+            return None  # when loading, a failed open skips the file instead
+        record = None
+        if cache is not None:
+            record = cache.lookup(root_key, rel_path, stat.st_size, stat.st_mtime)
+        text = None
+        if record is not None:
+            # the level was measured once; strictness is applied per run
+            level = record.level
+            if load and not is_binary_level(level, strict=binary_strict):
+                text = load_text(file)
+        else:
+            if load:
+                level, text = ingest_level(file, strict=binary_strict)
+            else:
+                level = path_binary_level(file)
+            if cache is not None:
+                cache.store(
+                    root_key,
+                    rel_path,
+                    stat.st_size,
+                    stat.st_mtime,
+                    level=level,
+                    sha=_blob_key(index, stat),
+                )
+        if is_binary_level(level, strict=binary_strict):
+            return None
+        return FileInfo(
+            path=Path(rel_path), size=stat.st_size, mtime=stat.st_mtime, text=text
+        )
+    except OSError:
+        return None
+
+
+def _blob_key(index: IndexEntry | None, stat: os.stat_result) -> str | None:
+    # an unchanged tracked file holds its git blob, which then keys its
+    # token counts in the scan cache without hashing the contents again
+    if index is None or not index.sha:
+        return None
+    if (stat.st_size, stat.st_mtime_ns) != (index.size, index.mtime_ns):
+        return None
+    return f"git:{index.sha.hex()}"
+
+
+class _Candidate(Protocol):
+    @property
+    def path(self) -> str: ...
+
+    def stat(self, *, follow_symlinks: bool = True) -> os.stat_result: ...
+
+
+class _TrackedFile:
+    """``os.DirEntry`` stand-in for a file listed in the git index."""
+
+    __slots__ = ("path", "index")
+
+    def __init__(self, path: str, index: IndexEntry) -> None:
+        self.path = path
+        self.index = index
+
+    def stat(self, *, follow_symlinks: bool = True) -> os.stat_result:
+        return os.stat(self.path, follow_symlinks=follow_symlinks)
+
+
+def _tracked(
+    root: Path, entries: Iterable[IndexEntry]
+) -> Iterator[Tuple[str, _Candidate]]:
+    """Yield ``(relative posix path, entry)`` for tracked files under *root*."""
+    base = os.fspath(root)
+    for entry in entries:
+        yield entry.path, _TrackedFile(os.path.join(base, entry.path), entry)
+
+
+def _walk_key(entry: os.DirEntry[str]) -> str:
+    # git orders paths bytewise with directories compared as "name/"
+    try:
+        return f"{entry.name}/" if entry.is_dir(follow_symlinks=False) else entry.name
+    except OSError:
+        return entry.name
+
+
+def _scan(directory: str) -> Iterator[os.DirEntry[str]]:
+    try:
+        with os.scandir(directory) as it:
+            return iter(sorted(it, key=_walk_key))
+    except OSError:
+        return iter(())
+
+
+def _walk(
+    root: Path,
+    skip_dir: Callable[[str], bool],
+    ignore: IgnoreIndex | None = None,
+) -> Iterator[Tuple[str, _Candidate]]:
+    """Yield ``(relative posix path, entry)`` for regular files under *root*.
+
+    Directories for which ``skip_dir`` returns True, or which *ignore* marks
+    as ignored, are pruned before they are opened. Each directory's
+    ``.gitignore`` extends *ignore* for its subtree. Symlinked directories are
+    not followed, matching ``Path.rglob``. Paths are yielded depth-first in
+    the same order as ``git ls-files`` so dumps are reproducible.
+    """
+    stack: List[Tuple[str, Iterator[os.DirEntry[str]], IgnoreIndex | None]] = []
+
+    def _enter(prefix: str, directory: str, index: IgnoreIndex | None) -> None:
+        entries = list(_scan(directory))
+        if index is not None and any(e.name == ".gitignore" for e in entries):
+            index = index.child_from_file(prefix, Path(directory, ".gitignore"))
+        stack.append((prefix, iter(entries), index))
+
+    _enter("", os.fspath(root), ignore)
+    while stack:
+        prefix, entries, index = stack[-1]
+        entry = next(entries, None)
+        if entry is None:
+            stack.pop()
+            continue
+        rel = f"{prefix}{entry.name}"
         try:
-            rel = file.relative_to(root)
-            rel_path = str(rel).replace("\\", "/")
-            if not file.is_file():
-                continue
-            if not any(fnmatch.fnmatch(rel_path, pattern) for pattern in include):
-                continue
-            if any(fnmatch.fnmatch(rel_path, pattern) for pattern in exclude):
-                continue
-            if is_binary_path(file, strict=binary_strict):
-                continue
-            stat = file.stat()
-            if not os.access(file, os.R_OK):
-                continue
-            if stat.st_size > max_size:
-                continue
-            files.append(FileInfo(path=rel, size=stat.st_size, mtime=stat.st_mtime))
+            if entry.is_dir(follow_symlinks=False):
+                if skip_dir(rel) or (index is not None and index.ignored(rel, True)):
+                    continue
+                _enter(f"{rel}/", entry.path, index)
+            elif entry.is_file():
+                if index is not None and index.ignored(rel):
+                    continue
+                yield rel, entry
         except OSError:
             continue
-    return files
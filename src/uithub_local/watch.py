@@ -0,0 +1,167 @@
+"""Keep a dump file up to date while the repository changes."""
+
+from __future__ import annotations
+
+import glob
+import os
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Tuple
+
+from .output import open_output
+from .renderer import Dump
+from .tokenizer import ENCODING_NAME
+from .walker import (
+    DEFAULT_MAX_SIZE,
+    FileInfo,
+    classify_file,
+    collect_files,
+    stat_files,
+)
+
+if TYPE_CHECKING:
+    from .cache import ScanCache
+
+
+class Watcher:
+    """Hold a :class:`Dump` in memory and refresh it from mtime polling.
+
+    Each :meth:`poll` stats the candidate files, and only files whose size or
+    mtime changed (or that appeared or disappeared) are classified, loaded and
+    tokenized again before the output file is rewritten.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        outfile: Path,
+        include: Iterable[str] | None = None,
+        exclude: Iterable[str] | None = None,
+        max_size: int = DEFAULT_MAX_SIZE,
+        *,
+        binary_strict: bool = True,
+        gitignore: bool = True,
+        tracked_only: bool = False,
+        jobs: int = 1,
+        max_tokens: int | None = None,
+        partial: bool = False,
+        fmt: str = "text",
+        indent: int | None = 2,
+        tokenizer: str = "exact",
+        encoding_model: str = ENCODING_NAME,
+        encoding: str = "utf-8",
+        compression: str | None = None,
+        cache: ScanCache | None = None,
+    ) -> None:
+        self.root = root
+        self.outfile = outfile
+        self.include = list(include or ["*"])
+        self.exclude = list(exclude or [])
+        try:
+            own = outfile.resolve().relative_to(root.resolve()).as_posix()
+            # never feed the dump back into itself
+            self.exclude.append(glob.escape(own))
+        except ValueError:
+            pass
+        self.max_size = max_size
+        self.binary_strict = binary_strict
+        self.gitignore = gitignore
+        self.tracked_only = tracked_only
+        self.fmt = fmt
+        self.indent = indent
+        self.encoding = encoding
+        self.compression = compression
+        self.cache = cache
+        files = collect_files(
+            root,
+            self.include,
+            self.exclude,
+            max_size=max_size,
+            binary_strict=binary_strict,
+            gitignore=gitignore,
+            jobs=jobs,
+            tracked_only=tracked_only,
+            cache=cache,
+        )
+        # skipped files are absent here; the first poll classifies them once
+        self._snapshot: Dict[str, Tuple[int, float]] = {
+            info.path.as_posix(): (info.size, info.mtime) for info in files
+        }
+        self.dump = Dump(
+            files,
+            root,
+            max_tokens,
+            cache,
+            jobs=jobs,
+            tokenizer=tokenizer,
+            encoding_model=encoding_model,
+            partial=partial,
+        )
+        self.write()
+
+    def write(self) -> None:
+        """Atomically replace the output file with the current dump.
+
+        Pending scan cache writes are committed as well, so the cache is
+        not left locked while the watcher sits idle.
+        """
+        tmp = self.outfile.with_name(f".{self.outfile.name}.tmp")
+        with open_output(tmp, self.encoding, self.compression) as stream:
+            self.dump.write(stream, self.fmt, indent=self.indent)
+        os.replace(tmp, self.outfile)
+        self._flush()
+
+    def _flush(self) -> None:
+        if self.cache is not None:
+            self.cache.flush()
+
+    def poll(self) -> int:
+        """Apply changes since the last poll and return the number applied."""
+        snapshot = stat_files(
+            self.root,
+            self.include,
+            self.exclude,
+            gitignore=self.gitignore,
+            tracked_only=self.tracked_only,
+        )
+        removed = [
+            rel for rel in self._snapshot if rel not in snapshot and rel in self.dump
+        ]
+        changed: List[FileInfo] = []
+        for rel, stamp in snapshot.items():
+            if self._snapshot.get(rel) == stamp:
+                continue
+            info = classify_file(
+                self.root,
+                rel,
+                self.max_size,
+                binary_strict=self.binary_strict,
+                cache=self.cache,
+            )
+            if info is not None:
+                changed.append(info)
+            elif rel in self.dump:
+                removed.append(rel)
+        self._snapshot = snapshot
+        if not changed and not removed:
+            self._flush()  # classify_file may have cached skipped files
+            return 0
+        self.dump.update(changed, removed)
+        self.write()
+        return len(changed) + len(removed)
+
+    def run(
+        self,
+        interval: float = 1.0,
+        *,
+        cycles: int | None = None,
+        on_update: Callable[[int], None] | None = None,
+    ) -> None:
+        """Poll every *interval* seconds, forever or for *cycles* polls."""
+        done = 0
+        while cycles is None or done < cycles:
+            time.sleep(interval)
+            count = self.poll()
+            if count and on_update is not None:
+                on_update(count)
+            done += 1
@@ -0,0 +1,15 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _isolated_cache(tmp_path_factory, monkeypatch):
+    """Keep the persistent scan cache out of the user's cache directory."""
+    monkeypatch.setenv("UITHUB_CACHE_DIR", str(tmp_path_factory.mktemp("cache")))
+
+
+@pytest.fixture(autouse=True)
+def _fresh_encodings(monkeypatch):
+    """Forget encodings (and load failures) remembered by earlier tests."""
+    from uithub_local import tokenizer
+
+    monkeypatch.setattr(tokenizer, "_encodings", {})
@@ -1,5 +1,10 @@
+import io
+import json
+import zipfile
 from pathlib import Path
 
+import responses
+
 from uithub_local import dump_repo
 
 
@@ -7,3 +12,48 @@ def test_dump_repo(tmp_path: Path):
     (tmp_path / "a.txt").write_text("hi")
     output = dump_repo(tmp_path, fmt="text")
     assert "hi" in output
+
+
+@responses.activate
+def test_dump_repos(tmp_path: Path):
+    from uithub_local import dump_repos
+
+    for name in ("one", "two"):
+        data = io.BytesIO()
+        with zipfile.ZipFile(data, "w") as zf:
+            zf.writestr(f"foo-{name}-sha/{name}.txt", f"text {name}")
+        responses.add(
+            responses.GET,
+            f"https://api.github.com/repos/foo/{name}/zipball",
+            body=data.getvalue(),
+            status=200,
+        )
+    (tmp_path / "local.txt").write_text("local text")
+    targets = ["foo/two", str(tmp_path), "https://github.com/foo/one"]
+    dumps = dump_repos(targets, concurrency=3, fmt="json")
+    assert list(dumps) == targets
+    assert json.loads(dumps["foo/two"])["files"][0]["contents"] == "text two"
+    assert "local text" in dumps[str(tmp_path)]
+    assert json.loads(dumps[targets[2]])["repo"] == "foo-one-sha"
+
+
+def test_dump_repos_shares_one_scan_cache(tmp_path: Path, monkeypatch):
+    from uithub_local import api, dump_repos
+    from uithub_local.cache import open_cache
+
+    opened = []
+
+    def _open_cache():
+        opened.append(open_cache())
+        return opened[-1]
+
+    monkeypatch.setattr(api, "open_cache", _open_cache)
+    targets = []
+    for i in range(4):
+        (tmp_path / f"r{i}").mkdir()
+        (tmp_path / f"r{i}" / "a.txt").write_text(f"repo {i}")
+        targets.append(str(tmp_path / f"r{i}"))
+    dumps = dump_repos(targets, concurrency=4)
+    assert [f"repo {i}" in dumps[t] for i, t in enumerate(targets)] == [True] * 4
+    assert len(opened) == 1
+    assert dump_repos(targets, cache=False) and len(opened) == 1
@@ -0,0 +1,135 @@
+from uithub_local.cache import ScanCache, default_cache_dir, open_cache
+from uithub_local.utils import BINARY, TEXT
+
+
+def test_default_cache_dir(monkeypatch, tmp_path):
+    monkeypatch.setenv("UITHUB_CACHE_DIR", str(tmp_path / "override"))
+    assert default_cache_dir() == tmp_path / "override"
+    monkeypatch.delenv("UITHUB_CACHE_DIR")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert default_cache_dir() == tmp_path / "uithub-local"
+
+
+def test_scan_cache_roundtrip(tmp_path):
+    db = tmp_path / "c.sqlite3"
+    with ScanCache(db) as cache:
+        assert cache.lookup("/r", "a.txt", 1, 2.0) is None
+        cache.store("/r", "a.txt", 1, 2.0, level=TEXT, sha="abc")
+        cache.store_tokens("abc", "m", 42)
+    with ScanCache(db) as cache:
+        record = cache.lookup("/r", "a.txt", 1, 2.0)
+        assert record is not None and record.sha == "abc" and record.level == TEXT
+        assert cache.lookup("/r", "a.txt", 1, 3.0) is None
+        assert cache.tokens("abc", "m") == 42
+        assert cache.tokens("abc", "other") is None
+
+
+def test_scan_cache_evicts_lru(tmp_path):
+    db = tmp_path / "c.sqlite3"
+    cache = ScanCache(db, max_bytes=32 * 1024)
+    for i in range(2000):
+        cache.store("/r", f"file-{i}.txt", i, 0.0, level=TEXT, sha=f"{i:064x}")
+    cache.close()
+    assert db.stat().st_size <= 32 * 1024
+    with ScanCache(db) as cache:
+        assert cache.lookup("/r", "file-0.txt", 0, 0.0) is None
+
+
+def test_open_cache_failure(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("x")
+    assert open_cache(blocker / "sub" / "c.sqlite3") is None
+    cache = open_cache()
+    assert cache is not None
+    cache.close()
+
+
+def test_archive_cache_evicts_least_recently_used(tmp_path):
+    import os
+
+    from uithub_local.cache import ArchiveCache
+
+    cache = ArchiveCache(tmp_path, max_bytes=250)
+    first = cache.store("https://x/a.zip", [b"a" * 100], etag='"a"')
+    os.utime(first, (1, 1))
+    second = cache.store("https://x/b.zip", [b"b" * 100], last_modified="then")
+    os.utime(second, (2, 2))
+    entry = cache.lookup("https://x/a.zip")
+    assert entry is not None and entry.etag == '"a"' and entry.last_modified is None
+    cache.touch(entry)  # a is now the most recently used
+    cache.store("https://x/c.zip", [b"c" * 100])
+    assert cache.lookup("https://x/b.zip") is None
+    assert cache.lookup("https://x/a.zip") is not None
+    assert cache.lookup("https://x/c.zip") is not None
+    assert not list(tmp_path.glob("*.part"))
+
+
+def test_archive_cache_ignores_damaged_entries(tmp_path):
+    from uithub_local.cache import ArchiveCache, open_archive_cache
+
+    cache = ArchiveCache(tmp_path)
+    path = cache.store("https://x/a.zip", [b"zip"], etag='"a"')
+    path.with_suffix(".json").write_text("{not json")
+    assert cache.lookup("https://x/a.zip") is None
+    blocker = tmp_path / "file"
+    blocker.write_text("x")
+    assert open_archive_cache(blocker / "archives") is None
+
+
+def test_scan_cache_tolerates_concurrent_writer(tmp_path):
+    import time
+
+    db = tmp_path / "c.sqlite3"
+    first = ScanCache(db)
+    first.store("/r", "a.txt", 1, 2.0, level=TEXT, sha="a")
+    first.flush()
+    first.store("/r", "b.txt", 1, 2.0, level=BINARY)  # holds the write lock
+    second = ScanCache(db, timeout=0.05)
+    started = time.monotonic()
+    assert second.lookup("/r", "a.txt", 1, 2.0) is not None  # WAL readers
+    assert second.lookup("/r", "b.txt", 1, 2.0) is None
+    for i in range(50):
+        second.store("/r", f"c{i}.txt", 1, 2.0, level=TEXT)
+        second.store_tokens(f"{i}", "m", i)
+    assert second.tokens("0", "m") is None
+    second.close()
+    assert time.monotonic() - started < 1  # gave up writing after one wait
+    first.close()
+    with ScanCache(db) as cache:
+        assert cache.lookup("/r", "b.txt", 1, 2.0) is not None
+        assert cache.lookup("/r", "c0.txt", 1, 2.0) is None
+
+
+def test_scan_cache_hits_do_not_write(tmp_path):
+    db = tmp_path / "c.sqlite3"
+    with ScanCache(db) as cache:
+        cache.store("/r", "a.txt", 1, 2.0, level=TEXT, sha="a")
+        cache.store_tokens("a", "m", 3)
+    reader = ScanCache(db)
+    assert reader.lookup("/r", "a.txt", 1, 2.0) is not None
+    assert reader.tokens("a", "m") == 3
+    assert not reader._db.in_transaction
+    with ScanCache(db, timeout=0.05) as writer:
+        writer.store("/r", "b.txt", 1, 2.0, level=TEXT)
+    reader.close()
+    with ScanCache(db) as cache:
+        assert cache.lookup("/r", "b.txt", 1, 2.0) is not None
+
+
+def test_scan_cache_rebuilds_files_from_older_schema(tmp_path):
+    import sqlite3
+
+    db = tmp_path / "c.sqlite3"
+    old = sqlite3.connect(db)
+    old.execute(
+        "CREATE TABLE files (root TEXT, path TEXT, size INTEGER, mtime REAL,"
+        " binary INTEGER, sha TEXT, used REAL, PRIMARY KEY (root, path))"
+    )
+    old.execute("INSERT INTO files VALUES ('/r', 'a.txt', 1, 2.0, 1, NULL, 0)")
+    old.commit()
+    old.close()
+    with ScanCache(db) as cache:
+        assert cache.lookup("/r", "a.txt", 1, 2.0) is None
+        cache.store("/r", "a.txt", 1, 2.0, level=BINARY)
+    with ScanCache(db) as cache:
+        assert cache.lookup("/r", "a.txt", 1, 2.0) == (BINARY, None)
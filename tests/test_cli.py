@@ -1,6 +1,10 @@
 from pathlib import Path
+import subprocess
+import sys
+import time
 
 from click.testing import CliRunner
+from freezegun import freeze_time
 import io
 import zipfile
 import responses
@@ -30,6 +34,81 @@ def test_cli_outfile(tmp_path: Path):
     assert outfile.read_text()
 
 
+@freeze_time("2024-01-01T00:00:00+00:00")
+def test_cli_outfile_and_stdout_match(tmp_path: Path):
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "a.txt").write_text("hello")
+    (src / "b.txt").write_text("world")
+    outfile = tmp_path / "out.txt"
+    runner = CliRunner()
+    result = runner.invoke(main, [str(src), "--outfile", str(outfile)])
+    assert result.exit_code == 0
+    assert result.stdout == outfile.read_text() + "\n"
+    assert result.stdout.endswith("world\n\n")
+
+
+def test_cli_jsonl_and_compact_json(tmp_path: Path):
+    import json
+
+    (tmp_path / "a.txt").write_text("hello")
+    runner = CliRunner()
+    result = runner.invoke(main, [str(tmp_path), "--format", "jsonl"])
+    assert result.exit_code == 0
+    lines = result.stdout.splitlines()
+    assert json.loads(lines[0])["contents"] == "hello"
+    assert json.loads(lines[-1])["type"] == "summary"
+    result = runner.invoke(main, [str(tmp_path), "--format", "json", "--compact"])
+    assert result.exit_code == 0
+    assert "\n" not in result.stdout.rstrip("\n")
+    assert json.loads(result.stdout)["files"][0]["path"] == "a.txt"
+
+
+def test_cli_compressed_outfile(tmp_path: Path):
+    import gzip
+    import lzma
+
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "a.txt").write_text("hello " * 100)
+    runner = CliRunner()
+    out = tmp_path / "dump.txt.gz"
+    result = runner.invoke(main, [str(src), "--outfile", str(out), "--no-stdout"])
+    assert result.exit_code == 0
+    assert "hello hello" in gzip.decompress(out.read_bytes()).decode()
+    out = tmp_path / "dump.txt"
+    args = [str(src), "--outfile", str(out), "--no-stdout", "--compress", "xz"]
+    assert runner.invoke(main, args).exit_code == 0
+    assert "hello hello" in lzma.decompress(out.read_bytes()).decode()
+    args = [str(src), "--outfile", str(out), "--no-stdout", "--compress", "none"]
+    assert runner.invoke(main, args).exit_code == 0
+    assert "hello hello" in out.read_text()
+    result = runner.invoke(main, [str(src), "--compress", "gzip"])
+    assert result.exit_code != 0
+    assert "--compress requires --outfile" in result.output
+
+
+def test_cli_shard_tokens(tmp_path: Path):
+    src = tmp_path / "src"
+    for name in ("a/x.txt", "a/y.txt", "b/z.txt"):
+        (src / name).parent.mkdir(parents=True, exist_ok=True)
+        (src / name).write_text(name * 40)
+    template = tmp_path / "dump-{n}.txt"
+    runner = CliRunner()
+    args = [str(src), "--outfile", str(template), "--shard-tokens", "200"]
+    result = runner.invoke(main, args + ["--jobs", "2"])
+    assert result.exit_code == 0
+    first = (tmp_path / "dump-1.txt").read_text()
+    second = (tmp_path / "dump-2.txt").read_text()
+    assert "### a/x.txt" in first and "### a/y.txt" in first
+    assert "### b/z.txt" in second and "a/x.txt" not in second
+    assert not (tmp_path / "dump-3.txt").exists()
+    assert "dump-2.txt" in result.stderr
+    result = runner.invoke(main, [str(src), "--shard-tokens", "10"])
+    assert result.exit_code != 0
+    assert "{n}" in result.output
+
+
 def test_cli_outfile_utf8(tmp_path: Path):
     (tmp_path / "a.txt").write_text("hi")
     out = tmp_path / "out.txt"
@@ -51,6 +130,27 @@ def test_cli_outfile_cp1252(tmp_path: Path):
     assert out.read_text(encoding="cp1252").startswith("# Uithub-local")
 
 
+def test_cli_failed_run_keeps_outfile(tmp_path: Path, monkeypatch):
+    from uithub_local import renderer
+
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "a.txt").write_text("hi")
+    out = tmp_path / "out.txt"
+    out.write_text("previous dump")
+
+    def broken(self, repo_name):
+        yield "# Uithub-local dump"
+        raise OSError("disk full")
+
+    monkeypatch.setattr(renderer.Dump, "_text_chunks", broken)
+    runner = CliRunner()
+    result = runner.invoke(main, [str(src), "--outfile", str(out), "--no-stdout"])
+    assert result.exit_code != 0
+    assert out.read_text() == "previous dump"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["out.txt", "src"]
+
+
 def test_cli_max_size(tmp_path: Path):
     from uithub_local.walker import DEFAULT_MAX_SIZE
 
@@ -90,6 +190,93 @@ def test_cli_remote(tmp_path: Path):
     assert "hi" in result.output
 
 
+def _mock_repo(owner_repo: str, text: str, status: int = 200) -> None:
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, "w") as zf:
+        zf.writestr(f"{owner_repo.replace('/', '-')}-sha/file.txt", text)
+    responses.add(
+        responses.GET,
+        f"https://api.github.com/repos/{owner_repo}/zipball",
+        body=data.getvalue(),
+        status=status,
+    )
+
+
+@responses.activate
+def test_cli_remote_batch(tmp_path: Path):
+    _mock_repo("foo/one", "first")
+    _mock_repo("foo/two", "second")
+    _mock_repo("foo/three", "third")
+    url_list = tmp_path / "urls.txt"
+    url_list.write_text("# nightly\nhttps://github.com/foo/two\n\nfoo/three  # x\n")
+    outfile = tmp_path / "{repo}.txt"
+    runner = CliRunner()
+    result = runner.invoke(
+        main,
+        [
+            "--remote-url",
+            "https://github.com/foo/one",
+            "--remote-url",
+            "foo/three",
+            "--url-list",
+            str(url_list),
+            "--concurrency",
+            "2",
+            "--outfile",
+            str(outfile),
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    assert result.stdout == ""
+    for slug, text in [("one", "first"), ("two", "second"), ("three", "third")]:
+        dump = (tmp_path / f"foo-{slug}.txt").read_text()
+        assert f"dump – foo-{slug}-sha –" in dump and text in dump
+        assert f"Wrote {tmp_path / f'foo-{slug}.txt'}" in result.stderr
+    archives = [c for c in responses.calls if "api.github.com" in c.request.url]
+    assert len(archives) == 3
+
+
+@responses.activate
+def test_cli_remote_batch_reports_failures(tmp_path: Path):
+    _mock_repo("foo/ok", "fine")
+    _mock_repo("foo/gone", "", status=404)
+    runner = CliRunner()
+    result = runner.invoke(
+        main,
+        [
+            "--remote-url",
+            "foo/gone",
+            "--remote-url",
+            "foo/ok",
+            "--outfile",
+            str(tmp_path / "{repo}.txt"),
+        ],
+    )
+    assert result.exit_code == 1
+    assert "foo/gone: Failed to download" in result.stderr
+    assert "fine" in (tmp_path / "foo-ok.txt").read_text()
+    assert not (tmp_path / "foo-gone.txt").exists()
+
+
+def test_cli_remote_batch_requires_repo_outfile(tmp_path: Path):
+    runner = CliRunner()
+    args = ["--remote-url", "foo/a", "--remote-url", "foo/b"]
+    result = runner.invoke(main, args)
+    assert result.exit_code == 2 and "{repo}" in result.output
+    same = ["--remote-url", "a/x", "--remote-url", "a-x", "--outfile", "{repo}.txt"]
+    result = runner.invoke(main, same)
+    assert result.exit_code == 2 and "Several URLs write to" in result.output
+
+
+def test_cli_html_lazy(tmp_path: Path):
+    (tmp_path / "a.txt").write_text("hello")
+    runner = CliRunner()
+    result = runner.invoke(main, [str(tmp_path), "--format", "html-lazy"])
+    assert result.exit_code == 0
+    assert "data-path='a.txt'" in result.stdout
+    assert "hello" not in result.stdout
+
+
 def test_cli_no_binary_strict(tmp_path: Path):
     noisy = tmp_path / "n.txt"
     noisy.write_bytes(b"\x80" * 40 + b"a" * 10)
@@ -137,3 +324,162 @@ def test_cli_auto_excludes_git(tmp_path: Path):
     result = runner.invoke(main, [str(tmp_path)])
     assert result.exit_code == 0
     assert ".git/config" not in result.output
+
+
+def test_cli_no_gitignore(tmp_path: Path):
+    (tmp_path / ".git").mkdir()
+    (tmp_path / ".gitignore").write_text("skip.txt\n")
+    (tmp_path / "skip.txt").write_text("ignored")
+    runner = CliRunner()
+    result = runner.invoke(main, [str(tmp_path)])
+    assert result.exit_code == 0
+    assert "### skip.txt" not in result.output
+    result = runner.invoke(main, [str(tmp_path), "--no-gitignore"])
+    assert "### skip.txt" in result.output
+
+
+def test_cli_jobs(tmp_path: Path):
+    (tmp_path / "a.txt").write_text("hello")
+    (tmp_path / "b.txt").write_text("world")
+    runner = CliRunner()
+    result = runner.invoke(main, [str(tmp_path), "--jobs", "4"])
+    assert result.exit_code == 0
+    assert result.output.index("a.txt") < result.output.index("b.txt")
+
+
+def test_cli_tracked_only(tmp_path: Path):
+    import shutil
+    import subprocess
+
+    import pytest
+
+    if shutil.which("git") is None:
+        pytest.skip("git not installed")
+    subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+    (tmp_path / "tracked.txt").write_text("t")
+    subprocess.run(["git", "-C", str(tmp_path), "add", "tracked.txt"], check=True)
+    (tmp_path / "untracked.txt").write_text("u")
+    runner = CliRunner()
+    result = runner.invoke(main, [str(tmp_path), "--tracked-only"])
+    assert result.exit_code == 0
+    assert "### tracked.txt" in result.output
+    assert "untracked.txt" not in result.output
+
+
+def test_cli_no_cache(tmp_path: Path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setenv("UITHUB_CACHE_DIR", str(cache_dir))
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "a.txt").write_text("hello")
+    runner = CliRunner()
+    result = runner.invoke(main, [str(repo), "--no-cache"])
+    assert result.exit_code == 0
+    assert not cache_dir.exists()
+    result = runner.invoke(main, [str(repo)])
+    assert result.exit_code == 0
+    assert (cache_dir / "scan.sqlite3").exists()
+
+
+def test_cli_watch(tmp_path: Path, monkeypatch):
+    def stop(_):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr("uithub_local.watch.time.sleep", stop)
+    (tmp_path / "a.txt").write_text("hello")
+    out = tmp_path / "out.txt"
+    runner = CliRunner()
+    result = runner.invoke(main, [str(tmp_path), "--watch", "--outfile", str(out)])
+    assert result.exit_code == 0
+    assert "hello" in out.read_text()
+    result = runner.invoke(main, [str(tmp_path), "--watch"])
+    assert result.exit_code != 0
+    assert "--watch requires" in result.output
+
+
+def test_cli_fast_tokenizer(tmp_path: Path):
+    (tmp_path / "a.txt").write_text("hello " * 42)
+    runner = CliRunner()
+    result = runner.invoke(main, [str(tmp_path), "--tokenizer", "fast"])
+    assert result.exit_code == 0
+    assert "# ≈ 84 tokens" in result.output
+
+
+def test_cli_reports_tokenizer_fallback_in_one_line(tmp_path: Path, monkeypatch):
+    import tiktoken
+
+    def offline(name):
+        raise OSError("Max retries exceeded with url: ...")
+
+    monkeypatch.setattr(tiktoken, "get_encoding", offline)
+    (tmp_path / "a.txt").write_text("hello")
+    runner = CliRunner()
+    result = runner.invoke(main, [str(tmp_path), "--encoding-model", "o200k_base"])
+    assert result.exit_code == 0
+    assert result.stderr.splitlines() == [
+        "Warning: tiktoken encoding 'o200k_base' could not be loaded; "
+        "estimating tokens as chars/4"
+    ]
+
+
+def test_cli_encoding_model(tmp_path: Path, monkeypatch):
+    import tiktoken
+
+    class FakeEncoding:
+        def encode_ordinary(self, text):
+            return list(text)
+
+    names = []
+    monkeypatch.setattr(
+        tiktoken, "get_encoding", lambda name: names.append(name) or FakeEncoding()
+    )
+    (tmp_path / "a.txt").write_text("hello")
+    runner = CliRunner()
+    result = runner.invoke(main, [str(tmp_path), "--encoding-model", "o200k_base"])
+    assert result.exit_code == 0
+    assert "# ≈ 5 tokens" in result.output
+    assert names == ["o200k_base"]
+
+
+# modules only the commands that need them may import
+HEAVY_MODULES = (
+    "bz2",
+    "http.client",
+    "lzma",
+    "regex",
+    "requests",
+    "sqlite3",
+    "ssl",
+    "tiktoken",
+    "urllib3",
+    "zipfile",
+)
+
+
+def _modules(code: str) -> set:
+    # -S skips site hooks, which may import any of them on their own
+    code = f"import sys; sys.path[:] = {sys.path!r}; {code}; print(*sys.modules)"
+    out = subprocess.run(
+        [sys.executable, "-S", "-c", code], capture_output=True, text=True, check=True
+    )
+    return set(out.stdout.split())
+
+
+def test_cli_import_is_lazy():
+    loaded = _modules("import uithub_local.cli") - _modules("pass")
+    assert "uithub_local.cli" in loaded
+    assert sorted(loaded.intersection(HEAVY_MODULES)) == []
+
+
+def test_cli_cold_start_is_fast():
+    def _start(code: str) -> float:
+        times = []
+        for _ in range(3):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", code], check=True)
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    baseline = _start("pass")
+    # generous: the import itself takes well under 0.1s
+    assert _start("import uithub_local.cli") - baseline < 0.75
@@ -73,3 +73,317 @@ def test_archive_url_gitlab_and_zip():
 def test_archive_url_scp_style():
     url = _archive_url("git@github.com:foo/bar.git")
     assert url == "https://api.github.com/repos/foo/bar/zipball"
+
+
+@responses.activate
+def test_download_repo_spools_to_disk(monkeypatch):
+    from uithub_local import downloader
+
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, "w") as zf:
+        zf.writestr("repo/big.txt", "x" * 5000)
+    responses.add(
+        responses.GET,
+        "https://api.github.com/repos/foo/bar/zipball",
+        body=data.getvalue(),
+        status=200,
+    )
+    spools = []
+
+    class Spy(downloader.SpooledTemporaryFile):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            spools.append(self)
+
+    monkeypatch.setattr(downloader, "SpooledTemporaryFile", Spy)
+    monkeypatch.setattr(downloader, "CHUNK_SIZE", 64)
+    with download_repo("foo/bar", spool_threshold=100) as path:
+        assert (path / "big.txt").read_text() == "x" * 5000
+    assert spools[0]._rolled
+    assert spools[0].closed
+
+
+@responses.activate
+def test_open_archive_reads_members_without_extracting():
+    from uithub_local.downloader import archive_root, open_archive
+    from uithub_local.walker import iter_archive
+
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, "w") as zf:
+        zf.writestr("foo-bar-123/a.txt", "a")
+        zf.writestr("foo-bar-123/skip.log", "b")
+    responses.add(
+        responses.GET,
+        "https://api.github.com/repos/foo/bar/zipball",
+        body=data.getvalue(),
+        status=200,
+    )
+    with open_archive("foo/bar") as archive:
+        assert archive_root(archive, "foo/bar").name == "foo-bar-123"
+        files = list(iter_archive(archive, ["*"], ["*.log"]))
+        assert [(f.path.as_posix(), f.text) for f in files] == [("a.txt", "a")]
+
+
+def test_archive_root_without_top_directory():
+    from uithub_local.downloader import archive_root
+
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, "w") as zf:
+        zf.writestr("a.txt", "a")
+        zf.writestr("b/c.txt", "c")
+    with zipfile.ZipFile(data) as zf:
+        root = archive_root(zf, "https://example.com/snapshot.zip")
+    assert root.name == "snapshot"
+
+
+def _zip_bytes(text):
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, "w") as zf:
+        zf.writestr("repo/a.txt", text)
+    return data.getvalue()
+
+
+@pytest.fixture
+def archive_server():
+    """Serve ``/repo.zip`` locally, honouring conditional and range headers.
+
+    ``state["drops"]`` lists byte counts after which successive responses
+    cut the connection, after which ``state["then"]`` may replace the body
+    and ETag; ``state["errors"]`` answers that many requests with 503 first.
+    """
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    state = {
+        "body": _zip_bytes("v1"),
+        "etag": '"v1"',
+        "last_modified": None,
+        "ranges": True,
+        "drops": [],
+        "errors": 0,
+    }
+    seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep connections alive
+
+        def do_GET(self):
+            seen.append(dict(self.headers, client=self.client_address))
+            etag, modified = state["etag"], state["last_modified"]
+            if state["errors"]:
+                state["errors"] -= 1
+                self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            if (etag and self.headers.get("If-None-Match") == etag) or (
+                modified and self.headers.get("If-Modified-Since") == modified
+            ):
+                self.send_response(304)
+                self.end_headers()
+                return
+            body, start = state["body"], 0
+            wanted = self.headers.get("Range")
+            if_range = self.headers.get("If-Range")
+            if state["ranges"] and wanted and if_range in (etag, modified):
+                start = int(wanted.split("=")[1].split("-")[0])
+                self.send_response(206)
+                self.send_header(
+                    "Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}"
+                )
+            else:
+                self.send_response(200)
+            if etag:
+                self.send_header("ETag", etag)
+            if modified:
+                self.send_header("Last-Modified", modified)
+            self.send_header("Content-Length", str(len(body) - start))
+            self.end_headers()
+            if state["drops"]:
+                self.wfile.write(body[start : start + state["drops"].pop(0)])
+                self.close_connection = True
+                if "then" in state:  # the archive changes after the drop
+                    state["body"], state["etag"] = state.pop("then")
+                return
+            self.wfile.write(body[start:])
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/repo.zip"
+    yield url, state, seen
+    server.shutdown()
+    server.server_close()
+
+
+def _read_a(url, cache):
+    from uithub_local.downloader import open_archive
+
+    with open_archive(url, cache=cache) as archive:
+        return archive.read("repo/a.txt").decode()
+
+
+def test_open_archive_revalidates_cached_archive(archive_server, tmp_path):
+    from uithub_local.cache import ArchiveCache
+
+    url, state, seen = archive_server
+    cache = ArchiveCache(tmp_path / "archives")
+    assert _read_a(url, cache) == "v1"
+    assert "If-None-Match" not in seen[0]
+    assert _read_a(url, cache) == "v1"
+    assert seen[1]["If-None-Match"] == '"v1"'
+
+    state["body"], state["etag"] = _zip_bytes("v2"), '"v2"'
+    assert _read_a(url, cache) == "v2"
+    assert _read_a(url, cache) == "v2"
+    assert len(seen) == 4 and len(list((tmp_path / "archives").glob("*.zip"))) == 1
+
+
+def test_open_archive_revalidates_by_last_modified(archive_server, tmp_path):
+    from uithub_local.cache import ArchiveCache
+
+    url, state, seen = archive_server
+    state["etag"], state["last_modified"] = None, "Sat, 17 Oct 2026 10:00:00 GMT"
+    cache = ArchiveCache(tmp_path / "archives")
+    assert _read_a(url, cache) == "v1"
+    assert _read_a(url, cache) == "v1"
+    assert seen[1]["If-Modified-Since"] == state["last_modified"]
+    assert "If-None-Match" not in seen[1]
+
+
+def test_open_archive_skips_cache_without_validators(archive_server, tmp_path):
+    from uithub_local.cache import ArchiveCache
+
+    url, state, seen = archive_server
+    state["etag"] = None
+    cache = ArchiveCache(tmp_path / "archives")
+    assert _read_a(url, cache) == "v1"
+    assert cache.lookup(url) is None
+    assert not list((tmp_path / "archives").iterdir())
+
+
+def test_pooled_session_reuses_connections(archive_server):
+    from uithub_local.downloader import open_archive, pooled_session
+
+    url, state, seen = archive_server
+    with pooled_session(2) as session:
+        for _ in range(3):
+            with open_archive(url, session=session) as archive:
+                assert archive.read("repo/a.txt") == b"v1"
+    assert len({request["client"] for request in seen}) == 1
+
+
+def test_repo_slug():
+    from uithub_local.downloader import repo_slug
+
+    assert repo_slug("https://github.com/foo/bar.git") == "foo-bar"
+    assert repo_slug("git@gitlab.com:group/sub/proj.git") == "group-sub-proj"
+    assert repo_slug("foo/bar") == "foo-bar"
+    assert repo_slug("https://example.com/snapshots/site.zip") == "site"
+
+
+def test_open_archive_resumes_interrupted_download(archive_server, monkeypatch):
+    from uithub_local import downloader
+
+    monkeypatch.setattr(downloader, "BACKOFF", 0)
+    monkeypatch.setattr(downloader, "CHUNK_SIZE", 16)
+    url, state, seen = archive_server
+    state["body"] = _zip_bytes("x" * 5000)
+    state["drops"] = [96, 48, 0]
+    with downloader.open_archive(url) as archive:
+        assert archive.read("repo/a.txt") == b"x" * 5000
+    assert [r.get("Range") for r in seen] == [
+        None,
+        "bytes=96-",
+        "bytes=144-",
+        "bytes=144-",
+    ]
+    assert all(r.get("If-Range") == '"v1"' for r in seen[1:])
+
+
+def test_open_archive_restarts_when_ranges_are_ignored(archive_server, monkeypatch):
+    from uithub_local import downloader
+
+    monkeypatch.setattr(downloader, "BACKOFF", 0)
+    url, state, seen = archive_server
+    monkeypatch.setattr(downloader, "CHUNK_SIZE", 16)
+    state["ranges"] = False
+    state["drops"] = [32]
+    assert _read_a(url, None) == "v1"
+    assert seen[1]["Range"] == "bytes=32-"
+
+
+def test_open_archive_retries_server_and_connection_errors(archive_server, monkeypatch):
+    import requests
+
+    from uithub_local import downloader
+
+    monkeypatch.setattr(downloader, "BACKOFF", 0)
+    url, state, seen = archive_server
+    state["errors"] = 2
+    assert _read_a(url, None) == "v1"
+    assert len(seen) == 3
+
+    real_get = requests.get
+    failures = iter([requests.ConnectionError("reset"), requests.Timeout("slow")])
+
+    def _flaky_get(*args, **kwargs):
+        for exc in failures:
+            raise exc
+        return real_get(*args, **kwargs)
+
+    monkeypatch.setattr(requests, "get", _flaky_get)
+    assert _read_a(url, None) == "v1"
+    monkeypatch.setattr(downloader, "ATTEMPTS", 2)
+    failures = iter([requests.ConnectionError("down")] * 2)
+    with pytest.raises(requests.ConnectionError):
+        _read_a(url, None)
+
+
+def test_open_archive_rejects_bad_archives(archive_server, monkeypatch, tmp_path):
+    from uithub_local import downloader
+    from uithub_local.cache import ArchiveCache
+
+    monkeypatch.setattr(downloader, "BACKOFF", 0)
+    url, state, seen = archive_server
+    cache = ArchiveCache(tmp_path / "archives")
+    state["drops"] = [10] * downloader.ATTEMPTS
+    state["ranges"] = False
+    with pytest.raises(RuntimeError, match="Failed to download"):
+        _read_a(url, cache)
+    state["body"] = b"not a zip"
+    with pytest.raises(RuntimeError, match="not a valid zip"):
+        _read_a(url, cache)
+    assert not list((tmp_path / "archives").iterdir())
+
+
+def test_open_archive_replaces_damaged_cache_entry(archive_server, tmp_path):
+    from uithub_local.cache import ArchiveCache
+
+    url, state, seen = archive_server
+    cache = ArchiveCache(tmp_path / "archives")
+    assert _read_a(url, cache) == "v1"
+    entry = cache.lookup(url)
+    entry.path.write_bytes(b"damaged")
+    assert _read_a(url, cache) == "v1"
+    assert "If-None-Match" not in seen[1]
+
+
+def test_open_archive_refetches_archive_changed_mid_download(
+    archive_server, monkeypatch, tmp_path
+):
+    from uithub_local import downloader
+    from uithub_local.cache import ArchiveCache
+
+    monkeypatch.setattr(downloader, "BACKOFF", 0)
+    monkeypatch.setattr(downloader, "CHUNK_SIZE", 16)
+    url, state, seen = archive_server
+    cache = ArchiveCache(tmp_path / "archives")
+    state["drops"] = [32]
+    state["then"] = (_zip_bytes("v2"), '"v2"')
+    assert _read_a(url, cache) == "v2"
+    assert seen[1]["If-Range"] == '"v1"'
+    assert cache.lookup(url).etag == '"v2"'
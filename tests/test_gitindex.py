@@ -0,0 +1,123 @@
+import shutil
+import struct
+import subprocess
+
+import pytest
+
+from uithub_local.gitindex import git_dir, parse_index, read_index
+
+
+def _entry(name: bytes, *, mode=0o100644, size=1, stage=0, version=2, prev=b""):
+    flags = (stage << 12) | min(len(name), 0xFFF)
+    stat = struct.pack(">LLLLLLLLLL", 0, 0, 7, 500, 0, 0, mode, 0, 0, size)
+    data = stat + b"\x11" * 20 + struct.pack(">H", flags)
+    if version == 4:
+        common = 0
+        while common < min(len(prev), len(name)) and prev[common] == name[common]:
+            common += 1
+        strip = len(prev) - common
+        assert strip < 0x80
+        return data + bytes([strip]) + name[common:] + b"\0"
+    data += name + b"\0"
+    return data + b"\0" * (-len(data) % 8)
+
+
+def _index(names, version=2, **kw):
+    body = b""
+    prev = b""
+    for name in names:
+        body += _entry(name, version=version, prev=prev, **kw)
+        prev = name
+    return struct.pack(">4sLL", b"DIRC", version, len(names)) + body
+
+
+@pytest.mark.parametrize("version", [2, 3, 4])
+def test_parse_index_versions(version):
+    names = [b"a.txt", b"src/a.py", b"src/b.py", b"src/pkg/c.py"]
+    entries = parse_index(_index(names, version=version))
+    assert [e.path for e in entries] == [n.decode() for n in names]
+    assert entries[0].mtime_ns == 7 * 1_000_000_000 + 500
+    assert entries[0].sha == b"\x11" * 20
+
+
+def test_parse_index_skips_non_regular_and_conflicts():
+    data = _index([b"link"], mode=0o120000) + b""
+    assert parse_index(data) == []
+    assert parse_index(_index([b"sub"], mode=0o160000)) == []
+    assert parse_index(_index([b"c.txt"], stage=2)) == []
+
+
+def test_parse_index_rejects_garbage():
+    with pytest.raises(ValueError):
+        parse_index(b"nope")
+    with pytest.raises(ValueError):
+        parse_index(struct.pack(">4sLL", b"DIRC", 9, 0))
+    with pytest.raises(ValueError):
+        parse_index(_index([b"a.txt"])[:-10])
+
+
+def test_git_dir_and_read_index(tmp_path):
+    assert read_index(tmp_path) is None
+    real = tmp_path / "real.git"
+    real.mkdir()
+    (real / "index").write_bytes(_index([b"a.txt"]))
+    (tmp_path / ".git").write_text("gitdir: real.git\n")
+    assert git_dir(tmp_path) == tmp_path / "real.git"
+    assert [e.path for e in read_index(tmp_path)] == ["a.txt"]
+    (tmp_path / ".git").write_text("junk")
+    assert git_dir(tmp_path) is None
+
+
+def test_read_index_clears_racy_blobs(tmp_path):
+    import os
+
+    (tmp_path / ".git").mkdir()
+    index = tmp_path / ".git" / "index"
+    index.write_bytes(_index([b"a.txt"]))
+    assert read_index(tmp_path)[0].sha == b"\x11" * 20
+    os.utime(index, ns=(7 * 1_000_000_000 + 500,) * 2)  # same instant as a.txt
+    assert read_index(tmp_path)[0].sha == b""
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git not installed")
+def test_read_index_from_git(tmp_path):
+    subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+    (tmp_path / "a.txt").write_text("a")
+    (tmp_path / "d").mkdir()
+    (tmp_path / "d" / "b.txt").write_text("bb")
+    subprocess.run(["git", "-C", str(tmp_path), "add", "."], check=True)
+    entries = read_index(tmp_path)
+    assert [(e.path, e.size) for e in entries] == [("a.txt", 1), ("d/b.txt", 2)]
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git not installed")
+def test_tracked_files_key_tokens_by_blob(tmp_path):
+    import os
+
+    from uithub_local.cache import ScanCache
+    from uithub_local.renderer import render
+    from uithub_local.tokenizer import approximate_tokens, token_model
+    from uithub_local.walker import collect_files
+
+    subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+    for name in ("a.txt", "b.txt"):
+        (tmp_path / name).write_text(name)
+        os.utime(tmp_path / name, (1_000_000_000, 1_000_000_000))  # not racy
+    subprocess.run(["git", "-C", str(tmp_path), "add", "."], check=True)
+    (tmp_path / "b.txt").write_text("changed since staged")
+    blob = subprocess.run(
+        ["git", "-C", str(tmp_path), "hash-object", "a.txt"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.strip()
+
+    root = str(tmp_path.resolve())
+    with ScanCache(tmp_path / "c.sqlite3") as cache:
+        files = collect_files(tmp_path, tracked_only=True, cache=cache)
+        a, b = (cache.lookup(root, f.path.name, f.size, f.mtime) for f in files)
+        assert a is not None and a.sha == f"git:{blob}"
+        assert b is not None and b.sha is None
+        render(files, tmp_path, cache=cache)
+        tokens = cache.tokens(f"git:{blob}", token_model())
+        assert tokens == approximate_tokens("a.txt")
@@ -0,0 +1,73 @@
+import pytest
+
+from uithub_local.ignore import IgnoreIndex, parse_rule, root_index
+
+
+@pytest.mark.parametrize(
+    "lines,path,is_dir,expected",
+    [
+        (["*.log"], "a.log", False, True),
+        (["*.log"], "deep/dir/a.log", False, True),
+        (["*.log", "!keep.log"], "keep.log", False, False),
+        (["/build"], "build", True, True),
+        (["/build"], "src/build", True, False),
+        (["build/"], "build", False, False),
+        (["build/"], "src/build", True, True),
+        (["doc/*.txt"], "doc/a.txt", False, True),
+        (["doc/*.txt"], "doc/sub/a.txt", False, False),
+        (["**/cache"], "a/b/cache", True, True),
+        (["a/**/b"], "a/b", False, True),
+        (["a/**/b"], "a/x/y/b", False, True),
+        (["out/**"], "out/x/y.o", False, True),
+        (["f[0-9].py"], "f1.py", False, True),
+        (["f[!0-9].py"], "f1.py", False, False),
+        (["\\#hash"], "#hash", False, True),
+        (["\\!bang"], "!bang", False, True),
+        (["# comment", "", "name  "], "name", False, True),
+        (["?.c"], "x/a.c", False, True),
+    ],
+)
+def test_ignore_rules(lines, path, is_dir, expected):
+    assert IgnoreIndex().child("", lines).ignored(path, is_dir) is expected
+
+
+def test_ignore_nested_levels_take_precedence():
+    index = IgnoreIndex().child("", ["*.txt"]).child("sub/", ["!keep.txt"])
+    assert index.ignored("a.txt")
+    assert index.ignored("sub/other.txt")
+    assert not index.ignored("sub/keep.txt")
+    assert index.ignored("keep.txt")
+
+
+def test_parse_rule_blank():
+    assert parse_rule("") is None
+    assert parse_rule("/") is None
+    assert IgnoreIndex().child("", ["#x"]).ignored("x") is False
+
+
+def test_root_index_reads_info_exclude(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "xdg"))
+    (tmp_path / "xdg" / "git").mkdir(parents=True)
+    (tmp_path / "xdg" / "git" / "config").write_text(
+        f"[core]\n\texcludesFile = {tmp_path / 'global'}\n"
+    )
+    (tmp_path / "global").write_text("*.bak\n")
+    (tmp_path / ".git" / "info").mkdir(parents=True)
+    (tmp_path / ".git" / "info" / "exclude").write_text("secret/\n")
+    index = root_index(tmp_path)
+    assert index.ignored("secret", True)
+    assert index.ignored("x.bak")
+    assert not index.ignored("x.py")
+    assert not root_index(tmp_path / "missing").ignored("secret", True)
+
+
+def test_root_index_only_inside_work_tree(tmp_path):
+    from uithub_local.ignore import in_work_tree
+
+    (tmp_path / "plain" / "sub").mkdir(parents=True)
+    assert root_index(tmp_path / "plain") is None
+    assert not in_work_tree(tmp_path / "plain" / "sub")
+    (tmp_path / "plain" / ".git").write_text("gitdir: ../real.git\n")  # worktree
+    assert in_work_tree(tmp_path / "plain" / "sub")
+    assert root_index(tmp_path / "plain" / "sub") is not None
@@ -4,3 +4,52 @@ def test_load_text_success(tmp_path):
     p = tmp_path / "a.txt"
     p.write_text("hi")
     assert load_text(p) == "hi"
+
+
+def test_load_text_invalid_utf8(tmp_path):
+    from uithub_local.loader import load_text
+
+    p = tmp_path / "a.txt"
+    p.write_bytes(b"a\xffb")
+    assert load_text(p) == "a�b"
+
+
+def test_ingest_sniffs_and_decodes_one_buffer(tmp_path, monkeypatch):
+    from uithub_local import loader
+
+    text = tmp_path / "a.txt"
+    text.write_bytes(b"x\xff" * 10)
+    binary = tmp_path / "b.bin"
+    binary.write_bytes(b"\0\1")
+    assert loader.ingest(text) is None  # >30% non-text bytes under strict
+    assert loader.ingest(text, strict=False) == "x�" * 10
+    assert loader.ingest(binary, strict=False) is None
+    monkeypatch.setattr(loader, "MMAP_THRESHOLD", 4)
+    assert loader.ingest(text, strict=False) == "x�" * 10
+    assert loader.load_text(text) == "x�" * 10
+
+
+def test_crlf_and_cr_read_as_universal_newlines(tmp_path, monkeypatch):
+    from uithub_local import loader
+
+    p = tmp_path / "a.txt"
+    p.write_bytes(b"a\r\nb\rc\n")
+    assert loader.load_text(p) == p.read_text() == "a\nb\nc\n"
+    assert loader.ingest(p) == "a\nb\nc\n"
+    monkeypatch.setattr(loader, "MMAP_THRESHOLD", 4)  # mapped reads too
+    assert loader.load_text(p) == loader.ingest(p) == "a\nb\nc\n"
+
+
+def test_crlf_file_dumps_as_before(tmp_path):
+    from uithub_local.renderer import render
+    from uithub_local.walker import collect_files, iter_files
+
+    (tmp_path / "a.txt").write_bytes(b"a\r\nb\r\n")
+    (tmp_path / "b.txt").write_bytes(b"a\nb\n")
+    files = collect_files(tmp_path)
+    dump = render(files, tmp_path, fmt="jsonl")
+    loaded = render(iter_files(tmp_path, load=True), tmp_path, fmt="jsonl")
+    a, b, _summary = dump.splitlines()
+    assert a.replace("a.txt", "b.txt") == b
+    assert '"contents": "a\\nb\\n"' in a
+    assert loaded.splitlines()[:2] == [a, b]
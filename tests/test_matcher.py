@@ -0,0 +1,70 @@
+import fnmatch
+import itertools
+
+import pytest
+
+from uithub_local.matcher import PathMatcher
+
+PATTERNS = [
+    "*",
+    "**",
+    "*.py",
+    "src/**",
+    "src/*.py",
+    "docs/**/*.md",
+    "a?c.txt",
+    "[ab]*.txt",
+    "tests/**",
+    ".git/**",
+    "build",
+]
+
+PATHS = [
+    "a.py",
+    "abc.txt",
+    "b.txt",
+    "src/a.py",
+    "src/pkg/b.py",
+    "docs/guide/x.md",
+    "docs/x.md",
+    "tests/test_a.py",
+    ".git/config",
+    "build",
+    "build/out.o",
+    "README",
+]
+
+
+@pytest.mark.parametrize(
+    "include,exclude",
+    list(itertools.product([["*"], ["*.py"], ["src/**", "docs/**/*.md"]], PATTERNS)),
+)
+def test_matcher_agrees_with_fnmatch(include, exclude):
+    matcher = PathMatcher(include, [exclude])
+    for path in PATHS:
+        expected = any(fnmatch.fnmatch(path, p) for p in include) and not (
+            fnmatch.fnmatch(path, exclude)
+        )
+        assert matcher.matches(path) == expected, path
+
+
+@pytest.mark.parametrize("pattern", PATTERNS)
+def test_matcher_skip_dir_is_safe(pattern):
+    for include, exclude in (([pattern], []), (["*"], [pattern])):
+        matcher = PathMatcher(include, exclude)
+        for path in PATHS:
+            parts = path.split("/")
+            for depth in range(1, len(parts)):
+                rel_dir = "/".join(parts[:depth])
+                if matcher.skip_dir(rel_dir):
+                    assert not matcher.matches(path), (include, exclude, path)
+
+
+def test_matcher_skip_dir_prunes():
+    matcher = PathMatcher(["src/**"], [".git/**"])
+    assert matcher.skip_dir(".git")
+    assert matcher.skip_dir("docs")
+    assert not matcher.skip_dir("src")
+    assert not matcher.skip_dir("src/pkg")
+    assert PathMatcher(["*"], ["*"]).skip_dir("any")
+    assert not PathMatcher([], []).matches("a.txt")
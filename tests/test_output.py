@@ -0,0 +1,47 @@
+import gzip
+import lzma
+from pathlib import Path
+
+import pytest
+
+from uithub_local.output import infer_compression, open_output
+
+
+def test_infer_compression():
+    assert infer_compression(Path("dump.txt.gz")) == "gzip"
+    assert infer_compression(Path("dump.XZ")) == "xz"
+    assert infer_compression(Path("dump.jsonl.zst")) == "zstd"
+    assert infer_compression(Path("dump.txt")) is None
+
+
+@pytest.mark.parametrize(
+    "compression, read",
+    [
+        (None, lambda p: p.read_bytes()),
+        ("gzip", lambda p: gzip.decompress(p.read_bytes())),
+        ("xz", lambda p: lzma.decompress(p.read_bytes())),
+    ],
+)
+def test_open_output_round_trip(tmp_path: Path, compression, read):
+    path = tmp_path / "dump"
+    with open_output(path, "cp1252", compression) as stream:
+        stream.write("café ☃")
+    assert read(path) == "café ?".encode("cp1252")
+
+
+def test_open_output_zstd(tmp_path: Path):
+    path = tmp_path / "dump.zst"
+    try:
+        import zstandard
+    except ImportError:
+        with pytest.raises(RuntimeError, match="zstandard"):
+            open_output(path, compression="zstd")
+        return
+    with open_output(path, compression="zstd") as stream:
+        stream.write("hello")
+    assert zstandard.ZstdDecompressor().decompress(path.read_bytes()) == b"hello"
+
+
+def test_open_output_unknown(tmp_path: Path):
+    with pytest.raises(ValueError):
+        open_output(tmp_path / "dump", compression="rar")
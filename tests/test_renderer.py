@@ -72,3 +72,332 @@ def test_render_repo_name_dot(tmp_path: Path, monkeypatch):
     files = collect_files(Path("."), ["*"], [])
     output = render(files, Path("."))
     assert tmp_path.name in output.splitlines()[0]
+
+
+def test_render_reuses_cached_tokens(tmp_path: Path, monkeypatch):
+    from uithub_local import renderer
+    from uithub_local.cache import ScanCache
+
+    (tmp_path / "a.txt").write_text("hello world")
+    files = collect_files(tmp_path, ["*"], [])
+    with ScanCache(tmp_path / "c.sqlite3") as cache:
+        first = render(files, tmp_path, fmt="json", cache=cache)
+
+    def fail(text):
+        raise AssertionError("tokenized again")
+
+    monkeypatch.setattr(renderer, "approximate_tokens", fail)
+    monkeypatch.setattr(renderer, "count_tokens_batch", lambda t, **kw: fail(t))
+    with ScanCache(tmp_path / "c.sqlite3") as cache:
+        second = render(files, tmp_path, fmt="json", cache=cache)
+    assert first.split('"timestamp"')[0] == second.split('"timestamp"')[0]
+    assert '"tokens": 0' not in second
+
+
+@freeze_time("2024-01-01T00:00:00+00:00")
+@pytest.mark.parametrize("fmt", ["text", "json", "html"])
+def test_render_pipeline_matches_batch(tmp_path: Path, fmt):
+    from uithub_local.walker import iter_files
+
+    for i in range(20):
+        (tmp_path / f"f{i:02}.txt").write_text(f"content {i}\n" * i)
+    batch = render(collect_files(tmp_path), tmp_path, fmt=fmt)
+    piped = render(iter_files(tmp_path, jobs=3), tmp_path, fmt=fmt, prefetch=2)
+    assert piped == batch
+
+
+@freeze_time("2024-01-01T00:00:00+00:00")
+def test_render_batches_tokenization(tmp_path: Path, monkeypatch):
+    from uithub_local import renderer
+
+    for i in range(5):
+        (tmp_path / f"f{i}.txt").write_text("x" * (i + 1) * 8)
+    calls = []
+    real = renderer.count_tokens_batch
+
+    def spy(texts, jobs, **kwargs):
+        calls.append((len(texts), jobs))
+        return real(texts, jobs=jobs, **kwargs)
+
+    monkeypatch.setattr(renderer, "count_tokens_batch", spy)
+    monkeypatch.setattr(renderer, "TOKEN_BATCH", 2)
+    files = collect_files(tmp_path)
+    batched = render(files, tmp_path, fmt="json", jobs=3)
+    assert calls == [(2, 3), (2, 3), (1, 3)]
+    monkeypatch.setattr(renderer, "count_tokens_batch", real)
+    assert batched == render(files, tmp_path, fmt="json")
+
+
+@freeze_time("2024-01-01T00:00:00+00:00")
+def test_render_fast_tokenizer(tmp_path: Path, monkeypatch):
+    import json
+
+    from uithub_local import renderer
+    from uithub_local.tokenizer import estimate_tokens
+
+    (tmp_path / "a.py").write_text("x = 1\n" * 100)
+    (tmp_path / "b.md").write_text("word " * 100)
+    files = collect_files(tmp_path)
+    estimated = sum(estimate_tokens(f.size, f.path.suffix) for f in files)
+
+    exact_calls = []
+    real = renderer.count_tokens_batch
+
+    def spy(texts, jobs, **kwargs):
+        exact_calls.append(len(texts))
+        return real(texts, jobs=jobs, **kwargs)
+
+    monkeypatch.setattr(renderer, "count_tokens_batch", spy)
+    data = json.loads(render(files, tmp_path, fmt="json", tokenizer="fast"))
+    assert data["total_tokens"] == estimated
+    assert exact_calls == []
+
+    # far below the budget: estimates are kept
+    render(files, tmp_path, max_tokens=estimated * 2, tokenizer="fast")
+    assert exact_calls == []
+
+    # within the margin of the budget: exact counts decide
+    data = json.loads(
+        render(files, tmp_path, fmt="json", max_tokens=estimated, tokenizer="fast")
+    )
+    assert exact_calls == [2]
+    assert data["total_tokens"] <= estimated
+
+
+def test_file_dump_uses_loaded_text(tmp_path: Path):
+    from uithub_local.renderer import FileDump
+
+    info = FileInfo(Path("gone.txt"), 5, 0.0, text="hello")
+    assert FileDump(info, tmp_path).content == "hello"
+
+
+@freeze_time("2024-01-01T00:00:00+00:00")
+@pytest.mark.parametrize("fmt", ["text", "json", "html"])
+def test_render_to_streams_released_files(tmp_path: Path, fmt):
+    import io
+
+    from uithub_local.renderer import Dump, render_to
+
+    (tmp_path / "a.txt").write_text("alpha")
+    (tmp_path / "b.txt").write_text("beta")
+    files = collect_files(tmp_path)
+    dump = Dump(files, tmp_path, retain=5)
+    assert [fd._content for fd in dump.file_dumps] == ["alpha", None]
+    assert dump.file_dumps[1].content == "beta"
+    stream = io.StringIO()
+    render_to(stream, files, tmp_path, fmt=fmt, retain=0)
+    assert stream.getvalue() == render(files, tmp_path, fmt=fmt)
+
+
+def test_released_file_is_read_through_its_reader(tmp_path: Path):
+    from uithub_local.renderer import Dump
+
+    reads = []
+
+    def _reader() -> str:
+        reads.append(1)
+        return "from archive"
+
+    info = FileInfo(Path("a.txt"), 13, 0.0, text="from archive", reader=_reader)
+    dump = Dump([info], tmp_path / "missing", retain=0)
+    assert dump.file_dumps[0]._content is None
+    assert dump.file_dumps[0].content == "from archive"
+    assert reads == [1]
+
+
+@pytest.mark.parametrize("indent", [2, None, 0])
+def test_json_is_encoded_incrementally(tmp_path: Path, indent):
+    import json
+
+    from uithub_local.renderer import Dump
+
+    (tmp_path / "a.txt").write_text('quote " and\nnewline')
+    (tmp_path / "b.txt").write_text("ünïcode")
+    for files in (collect_files(tmp_path), []):
+        text = Dump(files, tmp_path).as_json("repo", indent)
+        assert text == json.dumps(json.loads(text), indent=indent)
+
+
+@freeze_time("2024-01-01T00:00:00+00:00")
+def test_render_jsonl(tmp_path: Path):
+    import io
+    import json
+
+    from uithub_local.renderer import render_to
+
+    (tmp_path / "a.txt").write_text("alpha")
+    (tmp_path / "b.txt").write_text("beta beta")
+    files = collect_files(tmp_path)
+    streamed = io.StringIO()
+    render_to(streamed, files, tmp_path, fmt="jsonl", prefetch=2)
+    assert streamed.getvalue() == render(files, tmp_path, fmt="jsonl")
+    records = [json.loads(line) for line in streamed.getvalue().splitlines()]
+    assert [r["type"] for r in records] == ["file", "file", "summary"]
+    assert [r["path"] for r in records[:2]] == ["a.txt", "b.txt"]
+    assert records[2]["files"] == 2
+    assert records[2]["total_tokens"] == records[0]["tokens"] + records[1]["tokens"]
+    limited = render(files, tmp_path, fmt="jsonl", max_tokens=records[1]["tokens"])
+    summary = json.loads(limited.splitlines()[-1])
+    assert summary["files"] == 1
+
+
+def test_pack_matches_dropping_largest_first(tmp_path: Path):
+    import random
+
+    from uithub_local.renderer import Dump
+
+    rng = random.Random(0)
+    for i in range(40):
+        (tmp_path / f"f{i:02}.txt").write_text("word " * rng.randint(1, 200))
+    files = collect_files(tmp_path)
+    everything = Dump(files, tmp_path).file_dumps
+    for limit in (0, 50, 500, 2000, 10**6):
+        # reference: drop the largest files until the rest fits
+        kept = sorted(everything, key=lambda f: (f.tokens, f.path.as_posix()))
+        while sum(f.tokens for f in kept) > limit:
+            kept.pop()
+        dump = Dump(files, tmp_path, max_tokens=limit)
+        survivors = {fd.path for fd in kept}
+        assert [fd.path for fd in dump.file_dumps] == [
+            fd.path for fd in everything if fd.path in survivors
+        ]
+        assert dump.total_tokens == sum(f.tokens for f in kept)
+
+
+def test_pack_counts_only_survivors(tmp_path: Path, monkeypatch):
+    from uithub_local import renderer
+
+    for i in range(10):
+        (tmp_path / f"f{i}.txt").write_text("x" * 40 * (i + 1))
+    files = collect_files(tmp_path)
+    counted = []
+    real = renderer.count_tokens_batch
+
+    def spy(texts, **kwargs):
+        counted.extend(texts)
+        return real(texts, **kwargs)
+
+    monkeypatch.setattr(renderer, "count_tokens_batch", spy)
+    monkeypatch.setattr(renderer, "TOKEN_BATCH", 2)
+    dump = renderer.Dump(files, tmp_path, max_tokens=35)
+    assert [fd.path.name for fd in dump.file_dumps] == ["f0.txt", "f1.txt"]
+    assert dump.total_tokens == 30
+    # the two survivors plus the batch that crossed the budget
+    assert len(counted) == 4
+
+
+def test_pack_partial_fills_budget(tmp_path: Path):
+    from uithub_local.renderer import Dump
+
+    (tmp_path / "a.txt").write_text("a" * 40)
+    (tmp_path / "b.txt").write_text("b" * 400)
+    files = collect_files(tmp_path)
+    dump = Dump(files, tmp_path, max_tokens=30, partial=True)
+    assert [(fd.path.name, fd.tokens) for fd in dump.file_dumps] == [
+        ("a.txt", 10),
+        ("b.txt", 20),
+    ]
+    assert dump.file_dumps[1].content == "b" * 80
+    assert dump.total_tokens == 30
+    # the loaded file itself is untouched
+    dump.max_tokens = None
+    dump.update([])
+    assert dump.file_dumps[1].content == "b" * 400
+
+
+@freeze_time("2024-01-01T00:00:00+00:00")
+def test_render_lazy_html(tmp_path: Path):
+    import base64
+    import re
+    import zlib
+
+    (tmp_path / "a.txt").write_text("<b>héllo</b>\n" * 200)
+    (tmp_path / "it's.md").write_text("x")
+    files = collect_files(tmp_path)
+    output = render(files, tmp_path, fmt="html-lazy")
+    assert "<b>héllo" not in output
+    assert "class='filter'" in output and "DecompressionStream" in output
+    assert "data-path='it&#x27;s.md'" in output
+    payloads = re.findall(
+        r"<script type='application/x-deflate-base64'>([^<]*)</script>", output
+    )
+    decoded = [zlib.decompress(base64.b64decode(p)).decode() for p in payloads]
+    assert decoded == ["<b>héllo</b>\n" * 200, "x"]
+    assert len(output) < len(render(files, tmp_path, fmt="html")) + 2000
+
+
+def test_dump_shards_keep_directories_together(tmp_path: Path):
+    from uithub_local.renderer import Dump
+
+    def write(rel: str, tokens: int) -> None:
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("x" * 4 * tokens)
+
+    write("a/one.txt", 30)
+    write("a/two.txt", 30)
+    write("b/c/big.txt", 50)
+    write("b/c/small.txt", 20)
+    write("b/d.txt", 40)
+    write("huge.txt", 250)
+    write("z.txt", 10)
+    dump = Dump(collect_files(tmp_path), tmp_path)
+    shards = dump.shards(100)
+    assert [[fd.path.as_posix() for fd in s.file_dumps] for s in shards] == [
+        ["a/one.txt", "a/two.txt"],
+        ["b/c/big.txt", "b/c/small.txt"],
+        ["b/d.txt"],
+        ["huge.txt"],
+        ["huge.txt"],
+        ["huge.txt", "z.txt"],
+    ]
+    assert [s.total_tokens for s in shards] == [60, 70, 40, 100, 100, 60]
+    assert "".join(s.file_dumps[0].content for s in shards[3:]) == "x" * 1000
+    assert dump.total_tokens == 430
+    assert len(Dump([], tmp_path).shards(10)) == 1
+
+
+def test_dump_shards_count_estimated_files_exactly(tmp_path: Path, monkeypatch):
+    from uithub_local import renderer
+    from uithub_local.renderer import Dump
+
+    for i in range(10):
+        (tmp_path / f"f{i}.txt").write_text("x" * 400)  # 100 exact tokens
+    monkeypatch.setattr(renderer, "estimate_tokens", lambda size, suffix: 95)
+    dump = Dump(collect_files(tmp_path), tmp_path, tokenizer="fast")
+    assert dump.total_tokens == 950
+    shards = dump.shards(195)
+    exact = renderer.approximate_tokens
+    for shard in shards:
+        assert sum(exact(fd.content) for fd in shard.file_dumps) <= 195
+    assert [s.total_tokens for s in shards] == [100] * 10
+    assert dump.total_tokens == 1000
+
+
+def test_fast_dump_skips_scan_cache_until_exact(tmp_path: Path, monkeypatch):
+    from uithub_local import renderer
+    from uithub_local.cache import ScanCache
+
+    (tmp_path / "a.py").write_text("x = 1\n" * 100)
+    files = collect_files(tmp_path)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("needed an exact count")
+
+    def rows(cache):
+        return cache._db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    with monkeypatch.context() as m:
+        m.setattr(renderer, "token_model", fail)
+        with ScanCache(tmp_path / "c.sqlite3") as cache:
+            render(files, tmp_path, cache=cache, tokenizer="fast")
+            assert rows(cache) == 0
+
+    # a budget below the estimate forces exact counts, which are cached
+    with ScanCache(tmp_path / "c.sqlite3") as cache:
+        first = render(files, tmp_path, max_tokens=10, tokenizer="fast", cache=cache)
+        assert rows(cache) == 1
+    monkeypatch.setattr(renderer, "count_tokens_batch", fail)
+    with ScanCache(tmp_path / "c.sqlite3") as cache:
+        second = render(files, tmp_path, max_tokens=10, tokenizer="fast", cache=cache)
+    assert first.splitlines()[1:] == second.splitlines()[1:]
@@ -1,6 +1,11 @@
+import os
 from pathlib import Path
 
-from uithub_local.tokenizer import approximate_tokens, total_tokens
+from uithub_local.tokenizer import (
+    approximate_tokens,
+    count_tokens_batch,
+    total_tokens,
+)
 
 
 def test_approximate_tokens():
@@ -11,3 +16,132 @@ def test_total_tokens(tmp_path: Path):
     p = tmp_path / "a.txt"
     p.write_text("hello")
     assert total_tokens([p]) >= 1
+
+
+def test_count_tokens_batch_fallback(monkeypatch):
+    import tiktoken
+
+    def offline(name):
+        raise OSError("offline")
+
+    monkeypatch.setattr(tiktoken, "get_encoding", offline)
+    assert count_tokens_batch(["abcdefgh", ""], jobs=2) == [2, 1]
+
+
+def test_count_tokens_batch_parallel(monkeypatch):
+    import tiktoken
+
+    class FakeEncoding:
+        def encode_ordinary(self, text):
+            return text.split()
+
+    monkeypatch.setattr(tiktoken, "get_encoding", lambda name: FakeEncoding())
+    texts = [" ".join(["w"] * n) for n in range(40)]
+    assert count_tokens_batch(texts, jobs=4) == list(range(40))
+    assert count_tokens_batch(texts[:3]) == [0, 1, 2]
+    assert approximate_tokens("a b c") == 3
+
+
+def test_count_tokens_batch_leaves_no_threads(monkeypatch):
+    import threading
+
+    import tiktoken
+
+    class FakeEncoding:
+        def encode_ordinary(self, text):
+            return text.split()
+
+    monkeypatch.setattr(tiktoken, "get_encoding", lambda name: FakeEncoding())
+    assert count_tokens_batch(["a b", "c"], jobs=4) == [2, 1]
+    names = [t.name for t in threading.enumerate()]
+    assert not [name for name in names if name.startswith("uithub-tokens")]
+
+
+def test_estimate_tokens():
+    from uithub_local.tokenizer import BYTES_PER_TOKEN, estimate_tokens
+
+    assert estimate_tokens(0, ".py") == 0
+    assert estimate_tokens(1, ".py") == 1
+    assert estimate_tokens(3700, ".py") == round(3700 / BYTES_PER_TOKEN[".py"])
+    assert estimate_tokens(3600, ".PY") == estimate_tokens(3600, ".py")
+    assert estimate_tokens(3490, ".unknown") == 1000
+
+
+def test_calibrate(monkeypatch):
+    from uithub_local import tokenizer
+
+    monkeypatch.setattr(
+        tokenizer,
+        "count_tokens_batch",
+        lambda texts, jobs: [len(t) // 2 for t in texts],
+    )
+    ratios = tokenizer.calibrate([(".PY", "x" * 40), (".py", "y" * 20), (".md", "")])
+    assert ratios == {".py": 2.0}
+
+
+def test_load_encoding_failure_warns_once(monkeypatch):
+    import warnings
+
+    import tiktoken
+
+    from uithub_local.tokenizer import FALLBACK_MODEL, load_encoding, token_model
+
+    calls = []
+
+    def offline(name):
+        calls.append(name)
+        raise OSError("offline")
+
+    monkeypatch.setattr(tiktoken, "get_encoding", offline)
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        assert load_encoding() is None
+        assert approximate_tokens("abcdefgh") == 2
+        assert count_tokens_batch(["abcd"]) == [1]
+        assert token_model() == FALLBACK_MODEL
+    assert calls == ["cl100k_base"]
+    assert len(caught) == 1
+    assert "cl100k_base" in str(caught[0].message)
+
+
+def test_load_encoding_by_name(monkeypatch, tmp_path: Path):
+    import tiktoken
+
+    from uithub_local.tokenizer import ENCODING_DIR_ENV, token_model
+
+    seen = []
+
+    class FakeEncoding:
+        def encode_ordinary(self, text):
+            return list(text)
+
+    def get_encoding(name):
+        seen.append((name, os.environ.get("TIKTOKEN_CACHE_DIR")))
+        return FakeEncoding()
+
+    monkeypatch.setattr(tiktoken, "get_encoding", get_encoding)
+    monkeypatch.setenv(ENCODING_DIR_ENV, str(tmp_path))
+    monkeypatch.delenv("TIKTOKEN_CACHE_DIR", raising=False)
+    assert approximate_tokens("abc", encoding="o200k_base") == 3
+    assert count_tokens_batch(["ab"], encoding="o200k_base") == [2]
+    assert token_model("o200k_base") == "o200k_base"
+    assert seen == [("o200k_base", str(tmp_path))]
+    assert "TIKTOKEN_CACHE_DIR" not in os.environ
+
+
+def test_split_tokens_keeps_characters_whole(monkeypatch):
+    import tiktoken
+
+    from uithub_local.tokenizer import split_tokens
+
+    class ByteEncoding:
+        # one token per UTF-8 byte
+        def encode_ordinary(self, text):
+            return list(text.encode("utf-8"))
+
+        def decode_bytes(self, tokens):
+            return bytes(tokens)
+
+    monkeypatch.setattr(tiktoken, "get_encoding", lambda name: ByteEncoding())
+    assert split_tokens("aé€b", 2) == [("a", 2), ("é", 2), ("€", 2), ("b", 1)]
+    assert split_tokens("", 2) == [("", 0)]
@@ -16,3 +16,112 @@ def test_is_binary_path_high_ascii(tmp_path):
     noisy.write_bytes(b"\x80" * 40 + b"a" * 10)
     assert is_binary_path(noisy)
     assert not is_binary_path(noisy, strict=False)
+
+
+def test_resolve_jobs():
+    import os
+
+    from uithub_local.utils import resolve_jobs
+
+    assert resolve_jobs(3) == 3
+    assert resolve_jobs(0) == (os.cpu_count() or 1)
+    assert resolve_jobs(None) >= 1
+
+
+def test_is_binary_bytes_matches_reference():
+    import random
+
+    from uithub_local.utils import ASCII_WHITELIST, is_binary_bytes
+
+    def reference(chunk: bytes) -> bool:
+        if b"\0" in chunk:
+            return True
+        non_text = sum(1 for b in chunk if not (32 <= b <= 126 or b in ASCII_WHITELIST))
+        return bool(chunk) and non_text / len(chunk) > 0.30
+
+    rng = random.Random(0)
+    for ratio in (0.0, 0.2, 0.29, 0.31, 0.5):
+        chunk = bytes(
+            rng.randint(128, 255) if rng.random() < ratio else rng.randint(32, 126)
+            for _ in range(4096)
+        )
+        assert is_binary_bytes(chunk) == reference(chunk)
+    assert not is_binary_bytes(b"")
+
+
+def test_is_binary_bytes_benchmark():
+    import timeit
+
+    from uithub_local.utils import ASCII_WHITELIST, is_binary_bytes
+
+    chunk = (b"def f(x):\n    return x * 2\n" * 400)[:8192]
+
+    def generator_count() -> int:
+        return sum(1 for b in chunk if not (32 <= b <= 126 or b in ASCII_WHITELIST))
+
+    slow = min(timeit.repeat(generator_count, number=20, repeat=3))
+    fast = min(timeit.repeat(lambda: is_binary_bytes(chunk), number=20, repeat=3))
+    assert fast * 10 < slow
+
+
+def test_has_binary_suffix():
+    from pathlib import Path
+
+    from uithub_local.utils import has_binary_suffix
+
+    assert has_binary_suffix(Path("logo.png"))
+    assert has_binary_suffix(Path("pkg.tar.gz"))
+    assert not has_binary_suffix(Path("main.py"))
+    assert not has_binary_suffix(Path("Makefile"))
+
+
+def test_imap_ordered_preserves_order():
+    import time
+
+    from uithub_local.utils import imap_ordered
+
+    def slow(n):
+        time.sleep(0.001 * (n % 3))
+        return n * 2
+
+    assert list(imap_ordered(slow, range(50), 4, window=3)) == [
+        n * 2 for n in range(50)
+    ]
+    assert list(imap_ordered(slow, range(5), 1)) == [0, 2, 4, 6, 8]
+
+
+def test_prefetch_yields_and_forwards_errors():
+    import pytest
+
+    from uithub_local.utils import prefetch
+
+    assert list(prefetch(iter(range(100)), 4)) == list(range(100))
+
+    def broken():
+        yield 1
+        raise RuntimeError("boom")
+
+    it = prefetch(broken(), 2)
+    assert next(it) == 1
+    with pytest.raises(RuntimeError, match="boom"):
+        next(it)
+
+
+def test_prefetch_close_stops_producer():
+    import itertools
+
+    from uithub_local.utils import prefetch
+
+    produced = []
+
+    def endless():
+        for n in itertools.count():
+            produced.append(n)
+            yield n
+
+    it = prefetch(endless(), 2)
+    assert next(it) == 0
+    it.close()
+    count = len(produced)
+    assert count <= 5
+    assert len(produced) == count
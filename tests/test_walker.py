@@ -57,3 +57,307 @@ def test_collect_files_trailing_backslash(tmp_path):
     names = {f.path.as_posix() for f in collect_files(tmp_path, ["*"], ["tests\\"])}
     assert "b.txt" in names
     assert not any(n.startswith("tests/") for n in names)
+
+
+def test_collect_files_prunes_excluded_dirs(tmp_path, monkeypatch):
+    import os
+
+    from uithub_local import walker
+
+    (tmp_path / "node_modules" / "pkg").mkdir(parents=True)
+    (tmp_path / "node_modules" / "pkg" / "x.js").write_text("x")
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "a.txt").write_text("hi")
+    scanned = []
+    real_scandir = os.scandir
+
+    def spy(path):
+        scanned.append(os.path.relpath(path, tmp_path))
+        return real_scandir(path)
+
+    monkeypatch.setattr(walker.os, "scandir", spy)
+    files = walker.collect_files(tmp_path, ["*"], ["node_modules/"])
+    assert [f.path.as_posix() for f in files] == ["src/a.txt"]
+    assert not any(p.startswith("node_modules") for p in scanned)
+
+
+def test_collect_files_sorted_and_skips_symlinked_dirs(tmp_path):
+    from uithub_local.walker import collect_files
+
+    (tmp_path / "b").mkdir()
+    (tmp_path / "b" / "c.txt").write_text("c")
+    (tmp_path / "a.txt").write_text("a")
+    (tmp_path / "link").symlink_to(tmp_path / "b", target_is_directory=True)
+    names = [f.path.as_posix() for f in collect_files(tmp_path)]
+    assert names == ["a.txt", "b/c.txt"]
+
+
+def test_collect_files_honours_gitignore(tmp_path):
+    from uithub_local.walker import collect_files
+
+    (tmp_path / ".git").mkdir()
+    (tmp_path / ".gitignore").write_text("build/\n*.log\n")
+    (tmp_path / "build").mkdir()
+    (tmp_path / "build" / "out.txt").write_text("x")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / ".gitignore").write_text("!keep.log\n")
+    (tmp_path / "sub" / "keep.log").write_text("k")
+    (tmp_path / "sub" / "drop.log").write_text("d")
+    (tmp_path / "a.txt").write_text("a")
+    names = [f.path.as_posix() for f in collect_files(tmp_path)]
+    assert names == [".gitignore", "a.txt", "sub/.gitignore", "sub/keep.log"]
+    names = {f.path.as_posix() for f in collect_files(tmp_path, gitignore=False)}
+    assert {"build/out.txt", "sub/drop.log"} <= names
+    # like git, a directory outside any work tree ignores its .gitignore files
+    (tmp_path / ".git").rmdir()
+    assert {f.path.as_posix() for f in collect_files(tmp_path)} == names
+
+
+def test_collect_files_parallel_matches_serial(tmp_path):
+    from uithub_local.walker import collect_files
+
+    for i in range(30):
+        sub = tmp_path / f"d{i % 3}"
+        sub.mkdir(exist_ok=True)
+        (sub / f"f{i}.txt").write_text("x" * i)
+    (tmp_path / "bin").write_bytes(b"\0\1")
+    serial = collect_files(tmp_path)
+    assert collect_files(tmp_path, jobs=4) == serial
+    assert collect_files(tmp_path, jobs=0) == serial
+    assert len(serial) == 30
+
+
+def test_collect_files_skips_oversized_without_reading(tmp_path, monkeypatch):
+    from uithub_local import walker
+    from uithub_local.utils import TEXT
+
+    (tmp_path / "big.txt").write_bytes(b"x" * 200)
+    (tmp_path / "a.txt").write_text("hi")
+    sniffed = []
+
+    def spy(path):
+        sniffed.append(path.name)
+        return TEXT
+
+    monkeypatch.setattr(walker, "path_binary_level", spy)
+    files = walker.collect_files(tmp_path, max_size=100)
+    assert [f.path.name for f in files] == ["a.txt"]
+    assert sniffed == ["a.txt"]
+
+
+def test_collect_files_tracked_only(tmp_path):
+    import struct
+
+    from uithub_local.walker import collect_files
+
+    def entry(name: bytes) -> bytes:
+        stat = struct.pack(">LLLLLLLLLL", 0, 0, 0, 0, 0, 0, 0o100644, 0, 0, 1)
+        data = stat + b"\0" * 20 + struct.pack(">H", len(name)) + name + b"\0"
+        return data + b"\0" * (-len(data) % 8)
+
+    (tmp_path / ".git").mkdir()
+    names = [b"a.txt", b"gone.txt", b"sub/b.txt"]
+    (tmp_path / ".git" / "index").write_bytes(
+        struct.pack(">4sLL", b"DIRC", 2, len(names)) + b"".join(map(entry, names))
+    )
+    (tmp_path / "a.txt").write_text("a")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "b.txt").write_text("changed since indexed")
+    (tmp_path / "untracked.txt").write_text("u")
+    files = collect_files(tmp_path, tracked_only=True)
+    assert [f.path.as_posix() for f in files] == ["a.txt", "sub/b.txt"]
+    assert files[1].size == len("changed since indexed")
+    walked = {f.path.as_posix() for f in collect_files(tmp_path)}
+    assert "untracked.txt" in walked
+    assert collect_files(tmp_path / "sub", tracked_only=True)[0].path.name == "b.txt"
+
+
+def test_collect_files_git_order(tmp_path):
+    from uithub_local.walker import collect_files
+
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "x.txt").write_text("x")
+    (tmp_path / "a.txt").write_text("a")
+    (tmp_path / "z.txt").write_text("z")
+    names = [f.path.as_posix() for f in collect_files(tmp_path)]
+    assert names == ["a.txt", "a/x.txt", "z.txt"]
+
+
+def test_collect_files_uses_scan_cache(tmp_path, monkeypatch):
+    from uithub_local import walker
+    from uithub_local.cache import ScanCache
+    from uithub_local.utils import TEXT
+
+    (tmp_path / "a.txt").write_text("hi")
+    (tmp_path / "b.dat").write_bytes(b"\0\1")
+    with ScanCache(tmp_path / "c.sqlite3") as cache:
+        first = walker.collect_files(tmp_path, ["*.txt", "*.dat"], cache=cache)
+    sniffed = []
+
+    def spy(path):
+        sniffed.append(path.name)
+        return TEXT
+
+    monkeypatch.setattr(walker, "path_binary_level", spy)
+    with ScanCache(tmp_path / "c.sqlite3") as cache:
+        second = walker.collect_files(tmp_path, ["*.txt", "*.dat"], cache=cache)
+    assert first == second
+    assert [f.path.name for f in second] == ["a.txt"]
+    assert sniffed == []
+
+
+def test_iter_files_is_lazy_and_matches_collect(tmp_path):
+    import types
+
+    from uithub_local.walker import collect_files, iter_files
+
+    for name in ("a.txt", "b.txt", "c.txt"):
+        (tmp_path / name).write_text(name)
+    it = iter_files(tmp_path, jobs=2)
+    assert isinstance(it, types.GeneratorType)
+    assert next(it).path.name == "a.txt"
+    assert list(iter_files(tmp_path, jobs=2)) == collect_files(tmp_path)
+
+
+def test_iter_files_load_reads_each_file_once(tmp_path, monkeypatch):
+    import builtins
+
+    from uithub_local.cache import ScanCache
+    from uithub_local.walker import iter_files
+
+    (tmp_path / "a.txt").write_text("hi")
+    (tmp_path / "b.dat").write_bytes(b"\0\1")
+    opened = []
+    real_open = builtins.open
+
+    def spy(file, *args, **kwargs):
+        opened.append(str(file))
+        return real_open(file, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, "open", spy)
+    files = list(iter_files(tmp_path, ["*.txt", "*.dat"], load=True))
+    assert [(f.path.name, f.text) for f in files] == [("a.txt", "hi")]
+    assert sorted(opened) == [str(tmp_path / "a.txt"), str(tmp_path / "b.dat")]
+    with ScanCache(tmp_path / "c.sqlite3") as cache:
+        list(iter_files(tmp_path, ["*.txt", "*.dat"], cache=cache))
+        files = list(iter_files(tmp_path, ["*.txt"], cache=cache, load=True))
+    assert [f.text for f in files] == ["hi"]
+
+
+def _zip_tree(root, archive_path, prefix="repo-abc/"):
+    import zipfile
+
+    with zipfile.ZipFile(archive_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for file in sorted(root.rglob("*")):
+            rel = file.relative_to(root).as_posix()
+            if file.is_dir():
+                zf.writestr(f"{prefix}{rel}/", "")
+            else:
+                zf.write(file, f"{prefix}{rel}")
+
+
+def test_iter_archive_matches_iter_files(tmp_path):
+    import zipfile
+
+    from uithub_local.walker import archive_prefix, iter_archive, iter_files
+
+    root = tmp_path / "src"
+    (root / "pkg" / "build").mkdir(parents=True)
+    (root / "docs").mkdir()
+    (root / ".gitignore").write_text("build/\n*.log\n")
+    (root / "pkg" / ".gitignore").write_text("secret.txt\n")
+    (root / "pkg" / "a.py").write_text("print('a')\n")
+    (root / "pkg" / "secret.txt").write_text("s")
+    (root / "pkg" / "build" / "out.txt").write_text("o")
+    (root / "pkg" / "big.txt").write_text("x" * 200)
+    (root / "docs" / "index.md").write_text("# docs")
+    (root / "debug.log").write_text("log")
+    (root / "blob.dat").write_bytes(b"\0\1\2")
+    (root / "image.png").write_text("not really")
+    (root / "README").write_text("readme")
+    (root / ".git").mkdir()  # hosted archives are work trees
+    _zip_tree(root, tmp_path / "repo.zip")
+
+    with zipfile.ZipFile(tmp_path / "repo.zip") as zf:
+        assert archive_prefix(zf) == "repo-abc/"
+        for include, exclude in [(["*"], []), (["pkg"], []), (["*"], ["docs/"])]:
+            expected = iter_files(root, include, exclude, max_size=100, load=True)
+            got = list(iter_archive(zf, include, exclude, max_size=100, jobs=2))
+            assert [(f.path, f.text) for f in got] == [
+                (f.path, f.text) for f in expected
+            ]
+        names = [f.path.as_posix() for f in iter_archive(zf, gitignore=False)]
+        assert "pkg/build/out.txt" in names and "debug.log" in names
+
+
+def test_iter_archive_skips_excluded_members(tmp_path, monkeypatch):
+    import zipfile
+
+    from uithub_local.walker import iter_archive
+
+    root = tmp_path / "src"
+    (root / "vendor").mkdir(parents=True)
+    (root / "a.txt").write_text("a")
+    (root / "vendor" / "lib.js").write_text("v")
+    (root / "huge.txt").write_text("x" * 50)
+    _zip_tree(root, tmp_path / "repo.zip", prefix="")
+
+    opened = []
+    with zipfile.ZipFile(tmp_path / "repo.zip") as zf:
+        original = zf.open
+
+        def _open(member, *args, **kwargs):
+            opened.append(getattr(member, "filename", member))
+            return original(member, *args, **kwargs)
+
+        monkeypatch.setattr(zf, "open", _open)
+        files = list(iter_archive(zf, ["*"], ["vendor/"], max_size=10))
+        assert [f.path.as_posix() for f in files] == ["a.txt"]
+        assert opened == ["a.txt"]
+        assert files[0].reader is not None and files[0].reader() == "a"
+
+
+def test_iter_archive_skips_corrupt_members(tmp_path):
+    import zipfile
+
+    from uithub_local.walker import iter_archive
+
+    root = tmp_path / "src"
+    root.mkdir()
+    (root / ".gitignore").write_text("*.log\n" * 50)
+    (root / "a.txt").write_text("hello " * 50)
+    (root / "b.txt").write_text("fine")
+    _zip_tree(root, tmp_path / "repo.zip")
+    data = bytearray((tmp_path / "repo.zip").read_bytes())
+    with zipfile.ZipFile(tmp_path / "repo.zip") as zf:
+        for name in ("repo-abc/.gitignore", "repo-abc/a.txt"):
+            member = zf.getinfo(name)
+            start = member.header_offset + 30 + len(member.filename)
+            data[start : start + 4] = b"\xff" * 4  # invalid deflate block
+    (tmp_path / "repo.zip").write_bytes(bytes(data))
+
+    with zipfile.ZipFile(tmp_path / "repo.zip") as zf:
+        files = list(iter_archive(zf, jobs=2))
+    assert [f.path.as_posix() for f in files] == ["b.txt"]
+
+
+def test_scan_cache_applies_binary_strict_per_run(tmp_path):
+    from uithub_local.cache import ScanCache
+    from uithub_local.walker import collect_files
+
+    # a few control bytes: binary under strict detection only
+    (tmp_path / "noisy.txt").write_bytes(b"ok\x01\x02\x03\x04")
+    (tmp_path / "a.txt").write_text("a")
+    db = tmp_path / "c.sqlite3"
+
+    def names(strict, cache):
+        files = collect_files(tmp_path, ["*.txt"], binary_strict=strict, cache=cache)
+        return [f.path.name for f in files]
+
+    for strict in (True, False, True):
+        expected = names(strict, None)
+        with ScanCache(db) as cache:
+            assert names(strict, cache) == expected
+        with ScanCache(db) as cache:  # answered from the cache
+            assert names(strict, cache) == expected
+    assert names(False, None) == ["a.txt", "noisy.txt"]
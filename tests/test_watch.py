@@ -0,0 +1,89 @@
+import os
+from pathlib import Path
+
+from uithub_local import renderer
+from uithub_local.cache import ScanCache
+from uithub_local.utils import TEXT
+from uithub_local.watch import Watcher
+
+
+def _touch(path: Path, text: str, mtime: float) -> None:
+    path.write_text(text)
+    os.utime(path, (mtime, mtime))
+
+
+def test_watcher_reloads_only_changes(tmp_path: Path, monkeypatch):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    _touch(repo / "a.txt", "alpha", 1000)
+    _touch(repo / "b.txt", "beta", 1000)
+    (repo / "blob.bin").write_bytes(b"\0\1")
+    out = repo / "dump.txt"
+    watcher = Watcher(repo, out)
+    assert "alpha" in out.read_text()
+    assert watcher.poll() == 0
+
+    loaded = []
+    real = renderer.load_text
+
+    def spy(path):
+        loaded.append(path.name)
+        return real(path)
+
+    monkeypatch.setattr(renderer, "load_text", spy)
+    _touch(repo / "a.txt", "ALPHA", 2000)
+    _touch(repo / "c.txt", "gamma", 2000)
+    assert watcher.poll() == 2
+    assert sorted(loaded) == ["a.txt", "c.txt"]
+    text = out.read_text()
+    assert "ALPHA" in text and "gamma" in text and "beta" in text
+    assert text.index("### a.txt") < text.index("### b.txt") < text.index("### c.txt")
+
+    (repo / "b.txt").unlink()
+    (repo / "c.txt").write_bytes(b"\0\0")
+    assert watcher.poll() == 2
+    text = out.read_text()
+    assert "### b.txt" not in text and "### c.txt" not in text
+    assert "dump.txt" not in text
+
+
+def test_watcher_run_with_cache(tmp_path: Path, monkeypatch):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    _touch(repo / "a.txt", "one", 1000)
+    out = tmp_path / "dump.json"
+    updates = []
+    with ScanCache(tmp_path / "c.sqlite3") as cache:
+        watcher = Watcher(repo, out, fmt="json", cache=cache)
+        monkeypatch.setattr(
+            "uithub_local.watch.time.sleep",
+            lambda _: _touch(repo / "a.txt", "two", 3000),
+        )
+        watcher.run(0, cycles=2, on_update=updates.append)
+    assert updates == [1]
+    assert '"contents": "two"' in out.read_text()
+
+
+def test_idle_watcher_leaves_cache_unlocked(tmp_path: Path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    _touch(repo / "a.txt", "one", 1000)
+    (repo / "blob.bin").write_bytes(b"\0\1")
+    db = tmp_path / "c.sqlite3"
+    with ScanCache(db) as cache:
+        watcher = Watcher(repo, tmp_path / "dump.txt", cache=cache)
+        assert not cache._db.in_transaction
+        assert watcher.poll() == 0  # classifies (and caches) blob.bin
+        assert not cache._db.in_transaction
+        with ScanCache(db, timeout=0.05) as other:
+            other.store("/other", "x.txt", 1, 1.0, level=TEXT)
+        assert cache.lookup("/other", "x.txt", 1, 1.0) is not None
+
+
+def test_watcher_compressed_outfile(tmp_path: Path):
+    import gzip
+
+    _touch(tmp_path / "a.txt", "alpha", 1000)
+    out = tmp_path / "dump.txt.gz"
+    Watcher(tmp_path, out, compression="gzip")
+    assert "alpha" in gzip.decompress(out.read_bytes()).decode()